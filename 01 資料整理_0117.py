@@ -25,6 +25,11 @@ def get_db_connection(db_path: str):
     :yield: 資料庫連接對象
     """
     conn = sqlite3.connect(db_path)  # 建立資料庫連接
+    # 資料庫每次執行都會重新建立，關閉同步寫入與磁碟日誌以加快大量寫入
+    conn.execute('PRAGMA journal_mode=MEMORY')
+    conn.execute('PRAGMA synchronous=OFF')
+    conn.execute('PRAGMA temp_store=MEMORY')  # 暫存表與排序放在記憶體
+    conn.execute('PRAGMA cache_size=-200000')  # 頁面快取約 200MB
     try:
         yield conn  # 返回連接對象供使用
     finally:
@@ -38,37 +43,42 @@ def clean_and_store_excel(excel_data: pd.ExcelFile, file_path: str, conn: sqlite
     :param conn: 資料庫連接對象
     :return: 總處理的行數
     """
+    # 檢查文件是否存在
+    if not Path(file_path).exists():
+        logging.warning(f"文件不存在，跳過處理: {file_path}")
+        return 0
+
     total_processed_rows = 0  # 初始化總處理行數
+    sheet_dfs = []  # 收集所有工作表清理後的資料，最後一次寫入資料庫
 
     # 遍歷 Excel 文件中的每個工作表
     for sheet_name in excel_data.sheet_names:
-        # 檢查文件是否存在
-        if not Path(file_path).exists():
-            logging.warning(f"文件不存在，跳過處理: {file_path}")
-            continue
-
-        # 讀取 Excel 文件中的工作表，跳過前 4 行
-        df = pd.read_excel(file_path, sheet_name=sheet_name, skiprows=4)
+        # 讀取 Excel 文件中的工作表，跳過前 4 行（沿用已開啟的 ExcelFile，避免每個工作表重新解析整個檔案）
+        df = excel_data.parse(sheet_name=sheet_name, skiprows=4)
         df.columns = df.iloc[0]  # 將第一行作為欄位名稱
-        df = df.drop(0).loc[:, df.columns.notna()].reset_index(drop=True)  # 刪除空欄位並重置索引
+        df = df.drop(0)
 
         # 清理「序號」欄位，確保其為數值型資料
         if '序號' in df.columns:
             df = df[pd.to_numeric(df['序號'], errors='coerce').notnull()]
 
-        # 刪除全為空值的欄位
-        df = df.dropna(axis=1, how='all')
+        # 以單一欄位遮罩同時刪除沒有名稱的欄位與全為空值的欄位，並重置索引
+        keep = df.columns.notna() & df.notna().any(axis=0).to_numpy()
+        df = df.loc[:, keep].reset_index(drop=True)
 
-        # 將「刷卡日期」和「刷卡時間」欄位轉換為字串類型
-        for col in ['刷卡日期', '刷卡時間']:
-            if col in df.columns:
-                df[col] = df[col].astype(str)
+        # 將「刷卡日期」和「刷卡時間」欄位一次轉換為字串類型，空值存為空字串而非 'nan'
+        str_cols = [col for col in ['刷卡日期', '刷卡時間'] if col in df.columns]
+        df[str_cols] = df[str_cols].astype('string').fillna('')
 
-        # 將清理後的資料存儲到 SQLite 資料庫的 `punch` 表中
-        df.to_sql('punch', conn, if_exists='replace', index=False)
+        sheet_dfs.append(df)
         total_processed_rows += len(df)  # 累計處理行數
         logging.info(f"處理工作表 '{sheet_name}'，轉換筆數: {len(df)}，累計總筆數: {total_processed_rows}")
 
+    # 將所有工作表合併後，在單一交易中存儲到 SQLite 資料庫的 `punch` 表中
+    if sheet_dfs:
+        with conn:
+            pd.concat(sheet_dfs, ignore_index=True).to_sql('punch', conn, if_exists='replace', index=False, chunksize=10000)
+
     return total_processed_rows
 
 def convert_date_time_format(conn: sqlite3.Connection):
@@ -81,95 +91,93 @@ def convert_date_time_format(conn: sqlite3.Connection):
     # 檢查 `punch` 表是否存在
     cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='punch'")
     if cursor.fetchone():
-        # 將「刷卡日期」從民國年格式轉換為西元年格式
-        cursor.execute(""" 
-            UPDATE punch 
-            SET 刷卡日期 = CASE 
-                WHEN LENGTH(刷卡日期) = 7 THEN 
-                    (CAST(SUBSTR(刷卡日期, 1, 3) AS INTEGER) + 1911) || '-' || 
-                    SUBSTR(刷卡日期, 4, 2) || '-' || 
-                    SUBSTR(刷卡日期, 6, 2)
-                ELSE 刷卡日期 
-            END
-        """)
-
-        # 將「刷卡時間」從 4 位數格式轉換為標準時間格式
-        cursor.execute("""
-            UPDATE punch 
-            SET 刷卡時間 = 
-                CASE 
-                    WHEN LENGTH(刷卡時間) = 4 THEN 
-                        SUBSTR(刷卡時間, 1, 2) || ':' || 
-                        SUBSTR(刷卡時間, 3, 2) || ':00'
-                    ELSE 刷卡時間 
-                END
-        """)
-        conn.commit()  # 提交事務
+        # 在同一次資料表掃描中完成兩項修正：
+        # 「刷卡日期」從民國年格式轉換為西元年格式，「刷卡時間」從 4 位數或 6 位數格式轉換為標準時間格式，
+        # 讓後續依刷卡時間排序編號時，不同格式的時間也能正確比較先後
+        with conn:
+            cursor.execute("""
+                UPDATE punch 
+                SET 刷卡日期 = CASE 
+                        WHEN LENGTH(刷卡日期) = 7 THEN 
+                            printf('%d-%s-%s',
+                                   CAST(SUBSTR(刷卡日期, 1, 3) AS INTEGER) + 1911,
+                                   SUBSTR(刷卡日期, 4, 2),
+                                   SUBSTR(刷卡日期, 6, 2))
+                        ELSE 刷卡日期 
+                    END,
+                    刷卡時間 = CASE 
+                        WHEN LENGTH(刷卡時間) = 4 THEN 
+                            printf('%s:%s:00', SUBSTR(刷卡時間, 1, 2), SUBSTR(刷卡時間, 3, 2))
+                        WHEN LENGTH(刷卡時間) = 6 AND INSTR(刷卡時間, ':') = 0 THEN 
+                            printf('%s:%s:%s', SUBSTR(刷卡時間, 1, 2), SUBSTR(刷卡時間, 3, 2), SUBSTR(刷卡時間, 5, 2))
+                        ELSE 刷卡時間 
+                    END
+            """)
         logging.info("日期和時間格式修正已完成")
     else:
         logging.warning("表 'punch' 不存在，無法進行日期和時間格式修正")
 
-def integrate_data(conn: sqlite3.Connection):
+def integrate_data(conn: sqlite3.Connection) -> int:
     """
     整合資料並創建新表。
     :param conn: 資料庫連接對象
-    :return: 整合後的資料
+    :return: 整合後的資料筆數
     """
-    # 查詢語句，將 `punch` 表和 `shift_class` 表進行左連接
-    query_integrate = """
+    # 將 `punch` 表和 `shift_class` 表進行左連接，並依刷卡時間為每天的打卡記錄編號
+    query_numbered = """
         SELECT 
             punch.公務帳號,
             shift_class.卡號,
             shift_class.姓名,
             shift_class.班別,
             punch.刷卡日期,
-            GROUP_CONCAT(punch.刷卡時間) AS 刷卡時間
+            punch.刷卡時間,
+            ROW_NUMBER() OVER (
+                PARTITION BY punch.公務帳號, punch.刷卡日期, shift_class.班別
+                ORDER BY punch.刷卡時間
+            ) AS 序號
         FROM
             punch
         LEFT JOIN
             shift_class ON punch.公務帳號 = shift_class.公務帳號
-        GROUP BY
-            punch.公務帳號, punch.刷卡日期, shift_class.班別;
     """
 
-    # 執行查詢並將結果存儲到 DataFrame 中
-    integrated_data = pd.read_sql(query_integrate, conn)
-
-    # 將「刷卡時間」欄位中的多個時間值拆分為多個欄位
-    split_times = integrated_data['刷卡時間'].str.split(',', expand=True)
-    max_splits = split_times.shape[1]  # 獲取拆分後的最大列數
-
-    # 創建新的欄位名稱（如 `刷卡時間1`, `刷卡時間2` 等）
-    time_columns = [f'刷卡時間{i+1}' for i in range(max_splits)]
-    new_columns = pd.DataFrame(split_times.values, columns=time_columns)
-    new_columns = new_columns.dropna(axis=1, how='all')  # 刪除全為空值的欄位
-
-    # 將拆分後的欄位與原始資料合併
-    integrated_data = pd.concat([integrated_data.drop(columns=['刷卡時間']), new_columns], axis=1)
-
-    # 檢查並確保「卡號」和「姓名」欄位存在
-    if '卡號' not in integrated_data.columns:
-        integrated_data['卡號'] = None
-    if '姓名' not in integrated_data.columns:
-        integrated_data['姓名'] = None
-
-    # 創建 `integrated_punch` 表
-    create_table_query = f"""
-    CREATE TABLE IF NOT EXISTS integrated_punch (
-        公務帳號 TEXT,
-        卡號 TEXT,
-        姓名 TEXT,
-        刷卡日期 TEXT,
-        班別 TEXT,
-        {', '.join([f'{col} TEXT' for col in new_columns.columns])}
-    );
+    # 獲取每人每天最多的打卡次數，決定需要幾個刷卡時間欄位
+    max_splits = conn.execute(f"SELECT IFNULL(MAX(序號), 0) FROM ({query_numbered})").fetchone()[0]
+
+    # 創建新的欄位（如 `刷卡時間1`, `刷卡時間2` 等），直接在資料庫中將打卡時間轉為多個欄位
+    time_columns = [f'MAX(CASE WHEN 序號 = {i+1} THEN 刷卡時間 END) AS 刷卡時間{i+1}' for i in range(max_splits)]
+    query_integrate = f"""
+        CREATE TABLE integrated_punch AS
+        SELECT 
+            公務帳號,
+            卡號,
+            姓名,
+            班別,
+            刷卡日期
+            {',' if time_columns else ''} {', '.join(time_columns)}
+        FROM
+            ({query_numbered})
+        GROUP BY
+            公務帳號, 刷卡日期, 班別
+        ORDER BY
+            公務帳號, 刷卡日期, 班別;
     """
-    conn.execute(create_table_query)
 
-    # 將整合後的資料存儲到 `integrated_punch` 表中
-    integrated_data.to_sql('integrated_punch', conn, if_exists='replace', index=False)
-    logging.info(f"整合後的打卡資料已存儲到 integrated_punch 表，共 {len(integrated_data)} 筆資料")
-    return integrated_data
+    # 創建 `integrated_punch` 表，並建立後續查詢常用的班別與刷卡日期索引
+    with conn:
+        conn.execute("DROP TABLE IF EXISTS integrated_punch")
+        conn.execute(query_integrate)
+        conn.execute("CREATE INDEX idx_ip_class ON integrated_punch(班別)")
+        conn.execute("CREATE INDEX idx_ip_date ON integrated_punch(刷卡日期)")
+        conn.execute("CREATE INDEX idx_ip_mmdd ON integrated_punch(strftime('%m-%d', 刷卡日期))")  # 打卡記錄查詢依月日篩選
+        conn.execute("CREATE INDEX idx_ip_class_order ON integrated_punch(班別, 卡號, 公務帳號, 姓名, 刷卡日期)")  # 夜點清單依班別查詢並依此順序排序
+        conn.execute("CREATE INDEX idx_ip_card_date ON integrated_punch(卡號, 刷卡日期)")  # 完整查詢依卡號與日期左連接打卡資料
+        conn.execute("ANALYZE integrated_punch")  # 建立統計資訊，讓查詢規劃器選用合適的索引
+
+    total_rows = conn.execute("SELECT COUNT(*) FROM integrated_punch").fetchone()[0]
+    logging.info(f"整合後的打卡資料已存儲到 integrated_punch 表，共 {total_rows} 筆資料")
+    return total_rows
 
 def main(config: Dict[str, str]):
     """
@@ -202,25 +210,25 @@ def main(config: Dict[str, str]):
         total_processed_rows = clean_and_store_excel(excel_data_1, config['file_path_1'], conn)
 
         # 處理第二個 Excel 文件（班別資料）
-        excel_data_2 = pd.ExcelFile(config['file_path_2'])
-        for sheet_name in excel_data_2.sheet_names:
-            if not Path(config['file_path_2']).exists():
-                logging.warning(f"班別資料文件不存在，跳過處理: {config['file_path_2']}")
-                continue
-            df = pd.read_excel(config['file_path_2'], sheet_name=sheet_name)
-            df.to_sql('shift_class', conn, if_exists='append', index=False)  # 直接存儲到 `shift_class` 表
-            total_processed_rows += len(df)
-            logging.info(f"處理工作表 '{sheet_name}'，直接存儲筆數: {len(df)}，累計總筆數: {total_processed_rows}")
+        if not Path(config['file_path_2']).exists():
+            logging.warning(f"班別資料文件不存在，跳過處理: {config['file_path_2']}")
+        else:
+            excel_data_2 = pd.ExcelFile(config['file_path_2'])
+            for sheet_name in excel_data_2.sheet_names:
+                df = excel_data_2.parse(sheet_name=sheet_name)
+                df.to_sql('shift_class', conn, if_exists='append', index=False)  # 直接存儲到 `shift_class` 表
+                total_processed_rows += len(df)
+                logging.info(f"處理工作表 '{sheet_name}'，直接存儲筆數: {len(df)}，累計總筆數: {total_processed_rows}")
 
         # 轉換日期和時間格式
         convert_date_time_format(conn)
 
         # 整合資料
-        integrated_data = integrate_data(conn)
+        integrate_data(conn)
 
         # 顯示整合後的資料頭部
         logging.info("整合後的打卡資料頭部：")
-        logging.info(integrated_data.head())
+        logging.info(pd.read_sql("SELECT * FROM integrated_punch LIMIT 5", conn))
 
     logging.info(f"清理和整合後的資料已保存到 {config['db_path']}")
 
@@ -1,5 +1,6 @@
 import sqlite3
 import pandas as pd
+import numpy as np
 import os
 from datetime import datetime
 import logging
@@ -43,19 +44,18 @@ def create_rules_dict(conn: sqlite3.Connection) -> Dict[str, Dict]:
     Returns:
         Dict[str, Dict]: 班別規則字典，key 為班別名稱, value為班別規則
     """
-    cursor = conn.cursor()
-    cursor.execute("SELECT DISTINCT 班別 FROM integrated_punch") # 查詢不重複的班別名稱
-    rules = cursor.fetchall() # 取得所有班別名稱
-    
-    rules_dict = {} # 初始化班別規則字典
-    for row in rules:
-        class_name = row[0] # 取出班別名稱
-        rules_dict[class_name] = { # 建立班別規則字典
+    night_meal_threshold = parse_time('22:00:00') # 設定預設夜點門檻時間為22:00:00，只解析一次
+    night_meal_threshold_seconds = night_meal_threshold.hour * 3600 + night_meal_threshold.minute * 60 + night_meal_threshold.second # 門檻時間距午夜的秒數
+
+    # 每個不重複的班別對應一組規則，共用同一個門檻時間
+    return {
+        class_name: {
             'class_name': class_name,
-            'night_meal_threshold': parse_time('22:00:00')  # 設定預設夜點門檻時間為22:00:00
+            'night_meal_threshold': night_meal_threshold,
+            'night_meal_threshold_seconds': night_meal_threshold_seconds
         }
-    
-    return rules_dict
+        for (class_name,) in conn.execute("SELECT DISTINCT 班別 FROM integrated_punch") # 查詢不重複的班別名稱
+    }
 
 
 def parse_time(time_str: str) -> datetime.time:
@@ -69,19 +69,57 @@ def parse_time(time_str: str) -> datetime.time:
         return None
     return datetime.strptime(time_str, '%H:%M:%S').time() # 將時間字串轉為datetime.time物件
 
-def process_night_meal_data(conn: sqlite3.Connection, class_name: str, rules: Dict, time_columns: List[str]) -> List[List]:
-    """處理特定班別的夜點數據
+def process_night_meal_data(data: pd.DataFrame, rules_dict: Dict, time_columns: List[str]) -> pd.DataFrame:
+    """處理所有班別的夜點數據
     Args:
-        conn (sqlite3.Connection): 資料庫連線物件
-        class_name (str): 班別名稱
-        rules (Dict): 班別規則字典，包含夜點門檻時間
+        data (pd.DataFrame): 所有班別的打卡紀錄
+        rules_dict (Dict): 班別規則字典，key 為班別名稱, value為班別規則
         time_columns (List[str]): 所有時間欄位名稱的列表
     Returns:
-        List[List]: 符合夜點資格的資料列表, 包含 `卡號`, `公務帳號`, `姓名`, `月份`, `日期`
+        pd.DataFrame: 符合夜點資格的資料, 包含 `卡號`, `公務帳號`, `姓名`, `年份`, `月份`, `日期`, `班別`
     """
-    # 獲取所有時間列的列表，並添加到查詢中
+    if not time_columns: # 沒有任何時間欄位則不會有夜點資料
+        return pd.DataFrame(columns=['卡號', '公務帳號', '姓名', '年份', '月份', '日期', '班別'])
+
+    threshold_seconds = {class_name: rules['night_meal_threshold_seconds'] for class_name, rules in rules_dict.items()} # 各班別的夜點門檻時間，以距午夜的秒數表示
+
+    last_seconds = get_last_punch_seconds(data, time_columns) # 取得每筆資料的最後一次打卡時間
+    is_night_meal = data['班別'].notna() & (last_seconds > data['班別'].map(threshold_seconds)) # 最後一次打卡時間大於所屬班別的門檻時間
+    night_meal = data[is_night_meal].drop_duplicates(subset=['班別', '公務帳號', '刷卡日期']) # 同一班別同一公務帳號同一天只記錄一次
+
+    dates = night_meal['刷卡日期'].to_numpy() # 刷卡日期字串格式為 YYYY-MM-DD
+    return pd.DataFrame({
+        '卡號': night_meal['卡號'],
+        '公務帳號': night_meal['公務帳號'],
+        '姓名': night_meal['姓名'],
+        '年份': [date[0:4] for date in dates], # 從刷卡日期字串中提取年
+        '月份': [date[5:7] for date in dates], # 從刷卡日期字串中提取月
+        '日期': [date[8:10] for date in dates], # 從刷卡日期字串中提取日
+        '班別': night_meal['班別'],
+    }).reset_index(drop=True)
+
+def get_last_punch_seconds(data: pd.DataFrame, time_columns: List[str]) -> np.ndarray:
+    """取得每筆資料的最後一次打卡時間
+    Args:
+        data (pd.DataFrame): 打卡紀錄
+        time_columns (List[str]): 所有時間欄位名稱的列表
+    Returns:
+        np.ndarray: 最後一次打卡時間距午夜的秒數 (int32)，沒有打卡紀錄則為 -1
+    """
+    times = data[time_columns].to_numpy(dtype=object) # 將所有時間欄位轉為二維陣列
+    last_idx = np.where(pd.notna(times), np.arange(len(time_columns)), -1).max(axis=1) # 每一列最後一個有值的欄位索引
+    last_times = pd.Series(times[np.arange(len(times)), last_idx], dtype=object).where(last_idx >= 0) # 沒有任何打卡時間的資料設為空值
+    hhmmss = last_times.str.replace(':', '', regex=False) # 將 HH:MM:SS 與 HHMMSS 統一為 HHMMSS
+    seconds = (pd.to_numeric(hhmmss.str[0:2], errors='coerce') * 3600
+               + pd.to_numeric(hhmmss.str[2:4], errors='coerce') * 60
+               + pd.to_numeric(hhmmss.str[4:6], errors='coerce'))
+    return seconds.fillna(-1).to_numpy(dtype=np.int32)
+
+
+def process_all_classes_data(conn: sqlite3.Connection, rules_dict: Dict, time_columns: List[str]) -> pd.DataFrame:
+    """處理所有班別數據並返回合併的DataFrame"""
+    # 一次讀取所有班別的資料，避免每個班別各掃描一次資料表
     time_columns_str = ', '.join(time_columns)
-    # 使用 SQL 查詢從 integrated_punch 表格讀取需要的資料
     data_query = f"""
     SELECT 
         ip.公務帳號, 
@@ -92,103 +130,36 @@ def process_night_meal_data(conn: sqlite3.Connection, class_name: str, rules: Di
         {',' if time_columns else ''} {time_columns_str}
     FROM 
         integrated_punch ip
-    WHERE 
-        ip.班別 = '{class_name}'
     ORDER BY 
-        ip.卡號 ASC, 
         ip.班別 ASC, 
+        ip.卡號 ASC, 
         ip.公務帳號 ASC, 
         ip.姓名 ASC, 
         ip.刷卡日期 ASC
     """
-    data = pd.read_sql_query(data_query, conn) # 將查詢結果轉為 Pandas DataFrame
-    
-    night_meal_data = [] # 初始化夜點資料列表
-    processed_dates = {}  # 初始化處理過的日期字典，key 為 公務帳號，value 為set
-
-    for _, row in data.iterrows(): # 迭代每一筆資料
-        account = row['公務帳號'] # 取得公務帳號
-        card_no = row['卡號'] # 取得卡號
-        date = row['刷卡日期'] # 取得刷卡日期
-        day = date[8:10]  # 從刷卡日期字串中提取日
-        month = date[5:7] # 從刷卡日期字串中提取月
-
-        if account not in processed_dates: # 如果該公務帳號還沒有被紀錄
-            processed_dates[account] = set() # 初始化一個空的集合，用來儲存處理過的日期
-
-        night_meal_recorded = check_night_meal(row, time_columns, rules['night_meal_threshold']) # 使用 check_night_meal 函數判斷是否符合夜點資格
-        if night_meal_recorded and date not in processed_dates[account]:  # 如果符合夜點資格，且該日期尚未被記錄
-            night_meal_data.append([card_no, account, row['姓名'], month, day]) # 將資料新增到夜點資料列表
-            processed_dates[account].add(date) # 將處理過的日期新增到處理過的日期集合中
-
-    return night_meal_data
-
-def check_night_meal(row: pd.Series, time_columns: List[str], night_meal_threshold: datetime.time) -> bool:
-    """檢查是否有夜間餐費記錄
-    Args:
-        row (pd.Series): 打卡紀錄
-        time_columns (List[str]): 所有時間欄位名稱的列表
-        night_meal_threshold (datetime.time): 夜點門檻時間
-    Returns:
-        bool: True 如果符合夜點資格，否則 False
-    """
-    for col in time_columns[::-1]: # 反向迭代時間欄位，以取得最後一次打卡時間
-        if not pd.isna(row[col]): # 如果該時間欄位有值
-            last_time_str = row[col]  # 取出最後一次打卡時間字串
-            if len(last_time_str) == 6:
-                last_time_str = f"{last_time_str[:2]}:{last_time_str[2:4]}:{last_time_str[4:6]}"
-            last_time = datetime.strptime(last_time_str, '%H:%M:%S').time() # 將最後一次打卡時間轉為 datetime.time 物件
-            return last_time > night_meal_threshold # 如果最後一次打卡時間大於門檻時間則回傳True
-    return False
+    data = pd.read_sql_query(data_query, conn)
+    logging.info(f"正在處理班別: {'、'.join(map(str, data['班別'].dropna().unique()))}")
 
+    # 所有班別一起判斷，直接得到單一的結果 DataFrame
+    return process_night_meal_data(data, rules_dict, time_columns)
 
-def process_all_classes_data(conn: sqlite3.Connection, rules_dict: Dict, time_columns: List[str]) -> pd.DataFrame:
-    """處理所有班別數據並返回合併的DataFrame"""
-    all_data = []
-    
-    for class_name, rules in rules_dict.items():
-        logging.info(f"正在處理班別: {class_name}")
-        class_data = process_night_meal_data(conn, class_name, rules, time_columns)
-        # 添加班別名稱到每筆資料
-        class_df = pd.DataFrame(class_data, columns=['卡號', '公務帳號', '姓名', '月份', '日期'])
-        class_df['班別'] = class_name
-        all_data.append(class_df)
-    
-    return pd.concat(all_data, ignore_index=True)
-
-def output_combined_html(output_dir: str, combined_df: pd.DataFrame, account_list: set):
+def output_combined_html(output_dir: str, combined_df: pd.DataFrame, account_list: frozenset):
     """輸出合併後的互動式HTML報表"""
     # 數據處理
     combined_df['月份'] = combined_df['月份'].astype(str) + '月'
     
-    # 建立記憶體資料庫處理分組
-    conn = sqlite3.connect(':memory:')
-    combined_df.to_sql('combined_data', conn, index=False)
-    
-    # 優化後的SQL查詢
-    query = """
-    SELECT 
-        班別,
-        卡號,
-        公務帳號,
-        姓名,
-        月份,
-        COUNT(DISTINCT 日期) AS 夜點天數,
-        GROUP_CONCAT(日期, ', ') AS 日期清單
-    FROM combined_data
-    GROUP BY 班別, 卡號, 公務帳號, 姓名, 月份
-    ORDER BY 班別, 卡號, 月份
-    """
-    summary_df = pd.read_sql(query, conn)
-    conn.close()
+    # 依班別、人員與月份分組，統計夜點天數並列出日期
+    summary_df = (
+        combined_df.sort_values(['年份', '日期'], kind='stable') # 依年份再依日期排序，跨年資料的日期清單才會依時間先後排列
+        .groupby(['班別', '卡號', '公務帳號', '姓名', '月份'], dropna=False)
+        .agg(夜點天數=('日期', 'nunique'), 日期清單=('日期', ', '.join))
+        .reset_index()
+        .sort_values(['班別', '卡號', '月份'], kind='stable', na_position='first')
+    )
 
     # 標註清單中的人名為紅色
-    summary_df['姓名'] = summary_df.apply(
-        lambda row: f'<span style="color: red;">{row["姓名"]}</span>' 
-        if row['公務帳號'] in account_list 
-        else row['姓名'], 
-        axis=1
-    )
+    in_list = summary_df['公務帳號'].isin(account_list)
+    summary_df.loc[in_list, '姓名'] = '<span style="color: red;">' + summary_df.loc[in_list, '姓名'].astype(str) + '</span>'
 
     # 按班別分組
     grouped_data = summary_df.groupby('班別')
@@ -308,12 +279,11 @@ def main(db_path: str, output_dir: str, list_path: str):
     try:
         # 讀取比對清單
         try:
-            list_df = pd.read_csv(list_path)
-            account_list = set(list_df['公務帳號'])  # 將清單資料的公務帳號讀取出來轉為 set
+            account_list = frozenset(pd.read_csv(list_path, usecols=['公務帳號'], dtype=str)['公務帳號'].dropna())  # 只讀取清單資料的公務帳號欄位並轉為 frozenset
             logging.info(f"已讀取清單資料，共 {len(account_list)} 筆資料")
         except Exception as e:
             logging.error(f"讀取清單資料錯誤: {e}")
-            account_list = set()  # 如果清單資料讀取失敗則使用空 set
+            account_list = frozenset()  # 如果清單資料讀取失敗則使用空 frozenset
 
         # 處理資料庫資料
         conn = connect_to_db(db_path)
@@ -1,5 +1,6 @@
 import sqlite3
 import pandas as pd
+import numpy as np
 import os
 from datetime import datetime
 import logging
@@ -43,19 +44,18 @@ def create_rules_dict(conn: sqlite3.Connection) -> Dict[str, Dict]:
     Returns:
         Dict[str, Dict]: 班別規則字典，key 為班別名稱, value為班別規則
     """
-    cursor = conn.cursor()
-    cursor.execute("SELECT DISTINCT 班別 FROM integrated_punch") # 查詢不重複的班別名稱
-    rules = cursor.fetchall() # 取得所有班別名稱
-    
-    rules_dict = {} # 初始化班別規則字典
-    for row in rules:
-        class_name = row[0] # 取出班別名稱
-        rules_dict[class_name] = { # 建立班別規則字典
+    night_meal_threshold = parse_time('22:00:00') # 設定預設夜點門檻時間為22:00:00，只解析一次
+    night_meal_threshold_seconds = night_meal_threshold.hour * 3600 + night_meal_threshold.minute * 60 + night_meal_threshold.second # 門檻時間距午夜的秒數
+
+    # 每個不重複的班別對應一組規則，共用同一個門檻時間
+    return {
+        class_name: {
             'class_name': class_name,
-            'night_meal_threshold': parse_time('22:00:00')  # 設定預設夜點門檻時間為22:00:00
+            'night_meal_threshold': night_meal_threshold,
+            'night_meal_threshold_seconds': night_meal_threshold_seconds
         }
-    
-    return rules_dict
+        for (class_name,) in conn.execute("SELECT DISTINCT 班別 FROM integrated_punch") # 查詢不重複的班別名稱
+    }
 
 
 def parse_time(time_str: str) -> datetime.time:
@@ -69,15 +69,13 @@ def parse_time(time_str: str) -> datetime.time:
         return None
     return datetime.strptime(time_str, '%H:%M:%S').time() # 將時間字串轉為datetime.time物件
 
-def process_night_meal_data(conn: sqlite3.Connection, class_name: str, rules: Dict, time_columns: List[str]) -> List[List]:
-    """處理特定班別的夜點數據
+def read_punch_data(conn: sqlite3.Connection, time_columns: List[str]) -> pd.DataFrame:
+    """一次讀取所有班別的打卡資料，避免每個班別各查詢、掃描一次資料表
     Args:
         conn (sqlite3.Connection): 資料庫連線物件
-        class_name (str): 班別名稱
-        rules (Dict): 班別規則字典，包含夜點門檻時間
         time_columns (List[str]): 所有時間欄位名稱的列表
     Returns:
-        List[List]: 符合夜點資格的資料列表, 包含 `卡號`, `公務帳號`, `姓名`, `月份`, `日期`
+        pd.DataFrame: 所有班別的打卡紀錄，依班別、卡號、公務帳號、姓名、刷卡日期排序
     """
     # 獲取所有時間列的列表，並添加到查詢中
     time_columns_str = ', '.join(time_columns)
@@ -92,54 +90,61 @@ def process_night_meal_data(conn: sqlite3.Connection, class_name: str, rules: Di
         {',' if time_columns else ''} {time_columns_str}
     FROM 
         integrated_punch ip
-    WHERE 
-        ip.班別 = '{class_name}'
     ORDER BY 
-        ip.卡號 ASC, 
         ip.班別 ASC, 
+        ip.卡號 ASC, 
         ip.公務帳號 ASC, 
         ip.姓名 ASC, 
         ip.刷卡日期 ASC
     """
-    data = pd.read_sql_query(data_query, conn) # 將查詢結果轉為 Pandas DataFrame
-    
-    night_meal_data = [] # 初始化夜點資料列表
-    processed_dates = {}  # 初始化處理過的日期字典，key 為 公務帳號，value 為set
-
-    for _, row in data.iterrows(): # 迭代每一筆資料
-        account = row['公務帳號'] # 取得公務帳號
-        card_no = row['卡號'] # 取得卡號
-        date = row['刷卡日期'] # 取得刷卡日期
-        day = date[8:10]  # 從刷卡日期字串中提取日
-        month = date[5:7] # 從刷卡日期字串中提取月
-
-        if account not in processed_dates: # 如果該公務帳號還沒有被紀錄
-            processed_dates[account] = set() # 初始化一個空的集合，用來儲存處理過的日期
-
-        night_meal_recorded = check_night_meal(row, time_columns, rules['night_meal_threshold']) # 使用 check_night_meal 函數判斷是否符合夜點資格
-        if night_meal_recorded and date not in processed_dates[account]:  # 如果符合夜點資格，且該日期尚未被記錄
-            night_meal_data.append([card_no, account, row['姓名'], month, day]) # 將資料新增到夜點資料列表
-            processed_dates[account].add(date) # 將處理過的日期新增到處理過的日期集合中
-
-    return night_meal_data
-
-def check_night_meal(row: pd.Series, time_columns: List[str], night_meal_threshold: datetime.time) -> bool:
-    """檢查是否有夜間餐費記錄
+    cursor = conn.execute(data_query)
+    cursor.arraysize = 10000 # 每次取回一萬筆，減少逐筆取回的呼叫次數
+    rows = []
+    for batch in iter(cursor.fetchmany, []): # 取到空列表即結束
+        rows.extend(batch)
+    return pd.DataFrame(rows, columns=[desc[0] for desc in cursor.description]) # 將查詢結果轉為 Pandas DataFrame
+
+def process_night_meal_data(data: pd.DataFrame, rules: Dict, time_columns: List[str]) -> List[List]:
+    """處理特定班別的夜點數據
+    Args:
+        data (pd.DataFrame): 該班別的打卡紀錄
+        rules (Dict): 班別規則字典，包含夜點門檻時間
+        time_columns (List[str]): 所有時間欄位名稱的列表
+    Returns:
+        List[List]: 符合夜點資格的資料列表, 包含 `卡號`, `公務帳號`, `姓名`, `月份`, `日期`
+    """
+    if not time_columns: # 沒有任何時間欄位則不會有夜點資料
+        return []
+
+    last_seconds = get_last_punch_seconds(data, time_columns) # 取得每筆資料的最後一次打卡時間
+    night_meal = data[last_seconds > rules['night_meal_threshold_seconds']] # 篩選最後一次打卡時間大於門檻時間的資料
+    night_meal = night_meal.drop_duplicates(subset=['公務帳號', '刷卡日期']) # 同一公務帳號同一天只記錄一次
+
+    dates = night_meal['刷卡日期'].to_numpy() # 刷卡日期字串格式為 YYYY-MM-DD
+    return pd.DataFrame({
+        '卡號': night_meal['卡號'],
+        '公務帳號': night_meal['公務帳號'],
+        '姓名': night_meal['姓名'],
+        '月份': [date[5:7] for date in dates], # 從刷卡日期字串中提取月
+        '日期': [date[8:10] for date in dates], # 從刷卡日期字串中提取日
+    }).values.tolist()
+
+def get_last_punch_seconds(data: pd.DataFrame, time_columns: List[str]) -> np.ndarray:
+    """取得每筆資料的最後一次打卡時間
     Args:
-        row (pd.Series): 打卡紀錄
+        data (pd.DataFrame): 打卡紀錄
         time_columns (List[str]): 所有時間欄位名稱的列表
-        night_meal_threshold (datetime.time): 夜點門檻時間
     Returns:
-        bool: True 如果符合夜點資格，否則 False
+        np.ndarray: 最後一次打卡時間距午夜的秒數 (int32)，沒有打卡紀錄則為 -1
     """
-    for col in time_columns[::-1]: # 反向迭代時間欄位，以取得最後一次打卡時間
-        if not pd.isna(row[col]): # 如果該時間欄位有值
-            last_time_str = row[col]  # 取出最後一次打卡時間字串
-            if len(last_time_str) == 6:
-                last_time_str = f"{last_time_str[:2]}:{last_time_str[2:4]}:{last_time_str[4:6]}"
-            last_time = datetime.strptime(last_time_str, '%H:%M:%S').time() # 將最後一次打卡時間轉為 datetime.time 物件
-            return last_time > night_meal_threshold # 如果最後一次打卡時間大於門檻時間則回傳True
-    return False
+    times = data[time_columns].to_numpy(dtype=object) # 將所有時間欄位轉為二維陣列
+    last_idx = np.where(pd.notna(times), np.arange(len(time_columns)), -1).max(axis=1) # 每一列最後一個有值的欄位索引
+    last_times = pd.Series(times[np.arange(len(times)), last_idx], dtype=object).where(last_idx >= 0) # 沒有任何打卡時間的資料設為空值
+    hhmmss = last_times.str.replace(':', '', regex=False) # 將 HH:MM:SS 與 HHMMSS 統一為 HHMMSS
+    seconds = (pd.to_numeric(hhmmss.str[0:2], errors='coerce') * 3600
+               + pd.to_numeric(hhmmss.str[2:4], errors='coerce') * 60
+               + pd.to_numeric(hhmmss.str[4:6], errors='coerce'))
+    return seconds.fillna(-1).to_numpy(dtype=np.int32)
 
 
 def output_night_meal_results(output_dir: str, class_name: str, night_meal_data: List):
@@ -151,26 +156,14 @@ def output_night_meal_results(output_dir: str, class_name: str, night_meal_data:
     """
     night_meal_df = pd.DataFrame(night_meal_data, columns=['卡號', '公務帳號', '姓名', '月份', '日期'])
     
-    # 使用 SQL 查詢進行分組和彙總
-    query = f"""
-        SELECT
-            卡號,
-            公務帳號,
-            姓名,
-            月份,
-            COUNT(DISTINCT 日期) AS 有記錄的總共天數,
-            GROUP_CONCAT(日期, ', ') AS 日期列表
-        FROM
-            (SELECT * from night_meal_df ORDER BY 日期)
-        GROUP BY
-            卡號, 公務帳號, 姓名, 月份
-        ORDER BY 卡號, 月份
-    """
-    
-    conn = sqlite3.connect(':memory:') # 建立一個暫存的 SQLite 資料庫
-    night_meal_df.to_sql('night_meal_df', conn, if_exists='replace', index=False)  # 將 night_meal_df 資料寫入暫存資料庫
-    night_meal_summary = pd.read_sql_query(query, conn)  # 從暫存資料庫查詢分組和彙總的資料
-    conn.close() # 關閉暫存的資料庫連線
+    # 依人員與月份分組，統計天數並列出日期
+    night_meal_summary = (
+        night_meal_df.sort_values('日期', kind='stable')
+        .groupby(['卡號', '公務帳號', '姓名', '月份'], dropna=False)
+        .agg(有記錄的總共天數=('日期', 'nunique'), 日期列表=('日期', ', '.join))
+        .reset_index()
+        .sort_values(['卡號', '月份'], kind='stable', na_position='first')
+    )
 
     night_meal_summary.to_csv(os.path.join(output_dir, f'{class_name}_night_meal_records.csv'), index=False, encoding='utf-8-sig') # 將資料輸出為csv檔案
 
@@ -189,9 +182,14 @@ def main(db_path: str, output_dir: str):
         rules_dict = create_rules_dict(conn) # 建立班別規則字典
         time_columns = get_time_columns(cursor)  # 取得所有時間欄位名稱
 
+        # 只掃描一次資料表，再於 pandas 中依班別分組（空值班別不會分到任何一組，與 班別 = NULL 查無資料相同）
+        data = read_punch_data(conn, time_columns)
+        class_groups = dict(tuple(data.groupby('班別', sort=False)))
+
         for class_name, rules in rules_dict.items(): # 迭代每一個班別規則
             logging.info(f"處理班別名稱: {rules['class_name']}")
-            night_meal_data = process_night_meal_data(conn, class_name, rules, time_columns) # 處理特定班別的夜點資料
+            class_data = class_groups.get(class_name, data.iloc[0:0]) # 取得該班別的打卡紀錄
+            night_meal_data = process_night_meal_data(class_data, rules, time_columns) # 處理特定班別的夜點資料
             output_night_meal_results(output_dir, rules['class_name'], night_meal_data)  # 輸出夜點資料到 CSV 檔案
 
     except Exception as e:
@@ -1,11 +1,15 @@
 import sqlite3
 import pandas as pd
+import numpy as np
 import os
+import html
 from datetime import datetime, date
 import logging
-from typing import Dict, List
+from typing import Dict, Iterator, List, Tuple
 import argparse
+from concurrent.futures import ProcessPoolExecutor
 from calendar import monthrange
+from functools import lru_cache
 
 # 設置日誌
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -43,19 +47,18 @@ def create_rules_dict(conn: sqlite3.Connection) -> Dict[str, Dict]:
     Returns:
         Dict[str, Dict]: 班別規則字典，key 為班別名稱, value為班別規則
     """
-    cursor = conn.cursor()
-    cursor.execute("SELECT DISTINCT 班別 FROM integrated_punch") # 查詢不重複的班別名稱
-    rules = cursor.fetchall() # 取得所有班別名稱
-    
-    rules_dict = {} # 初始化班別規則字典
-    for row in rules:
-        class_name = row[0] # 取出班別名稱
-        rules_dict[class_name] = { # 建立班別規則字典
+    night_meal_threshold = parse_time('22:00:00') # 設定預設夜點門檻時間為22:00:00，只解析一次
+    night_meal_threshold_seconds = night_meal_threshold.hour * 3600 + night_meal_threshold.minute * 60 + night_meal_threshold.second # 門檻時間距午夜的秒數
+
+    # 每個不重複的班別對應一組規則，共用同一個門檻時間
+    return {
+        class_name: {
             'class_name': class_name,
-            'night_meal_threshold': parse_time('22:00:00')  # 設定預設夜點門檻時間為22:00:00
+            'night_meal_threshold': night_meal_threshold,
+            'night_meal_threshold_seconds': night_meal_threshold_seconds
         }
-    
-    return rules_dict
+        for (class_name,) in conn.execute("SELECT DISTINCT 班別 FROM integrated_punch") # 查詢不重複的班別名稱
+    }
 
 def parse_time(time_str: str) -> datetime.time:
     """解析時間字符串為 datetime.time 對象
@@ -68,96 +71,127 @@ def parse_time(time_str: str) -> datetime.time:
         return None
     return datetime.strptime(time_str, '%H:%M:%S').time() # 將時間字串轉為datetime.time物件
 
-def process_night_meal_data(conn: sqlite3.Connection, class_name: str, rules: Dict, time_columns: List[str], account_list: set) -> List[List]:
-    """處理特定班別的夜點數據
+def process_night_meal_data(db_path: str, class_name: str, rules: Dict, time_columns: List[str], account_list: frozenset) -> List[List]:
+    """處理特定班別的夜點數據（在獨立的行程中執行，因此自行建立資料庫連線）
     Args:
-        conn (sqlite3.Connection): 資料庫連線物件
+        db_path (str): 資料庫檔案路徑
         class_name (str): 班別名稱
         rules (Dict): 班別規則字典，包含夜點門檻時間
         time_columns (List[str]): 所有時間欄位名稱的列表
-        account_list (set): 符合清單的公務帳號列表
+        account_list (frozenset): 符合清單的公務帳號列表
     Returns:
         List[List]: 符合夜點資格的資料列表, 包含 `卡號`, `公務帳號`, `姓名`, `月份`, `日期`, `班別`, `是否符合清單`
     """
-    # 獲取所有時間列的列表，並添加到查詢中
-    time_columns_str = ', '.join(time_columns)
-    # 使用 SQL 查詢從 integrated_punch 表格讀取需要的資料
+    if not time_columns: # 沒有任何時間欄位則不會有夜點資料
+        return []
+
+    # 由後往前取第一個有值的時間欄位即為最後一次打卡時間，並統一為 HHMMSS
+    # COALESCE 至少需要兩個參數，補上 NULL 讓只有一個時間欄位時也能執行
+    last_punch = f"REPLACE(COALESCE({', '.join(reversed(time_columns))}, NULL), ':', '')"
+    # 使用 SQL 查詢從 integrated_punch 表格讀取最後一次打卡時間大於門檻時間的資料
     data_query = f"""
     SELECT 
-        ip.公務帳號, 
-        ip.姓名, 
-        ip.卡號, 
-        ip.班別,
-        ip.刷卡日期
-        {',' if time_columns else ''} {time_columns_str}
-    FROM 
-        integrated_punch ip
+        公務帳號, 
+        姓名, 
+        卡號, 
+        班別,
+        刷卡日期,
+        CASE WHEN date(刷卡日期, '+0 days') = 刷卡日期 THEN CAST(strftime('%Y%m%d', 刷卡日期) AS INTEGER) END AS 日期數值 -- 只接受 YYYY-MM-DD 格式的有效日期並轉為整數（加上修飾子讓 02-30 等日期被正規化而不相等），其餘為 NULL
+    FROM (
+        SELECT 
+            ip.公務帳號, 
+            ip.姓名, 
+            ip.卡號, 
+            ip.班別,
+            ip.刷卡日期,
+            {last_punch} AS 最後打卡時間
+        FROM 
+            integrated_punch ip
+        WHERE 
+            ip.班別 = ?
+    )
     WHERE 
-        ip.班別 = '{class_name}'
+        CAST(SUBSTR(最後打卡時間, 1, 2) AS INTEGER) * 3600
+        + CAST(SUBSTR(最後打卡時間, 3, 2) AS INTEGER) * 60
+        + CAST(SUBSTR(最後打卡時間, 5, 2) AS INTEGER) > ?
     ORDER BY 
-        ip.卡號 ASC, 
-        ip.班別 ASC, 
-        ip.公務帳號 ASC, 
-        ip.姓名 ASC, 
-        ip.刷卡日期 ASC
+        卡號 ASC, 
+        公務帳號 ASC, 
+        姓名 ASC, 
+        刷卡日期 ASC
     """
-    data = pd.read_sql_query(data_query, conn)
-    
-    night_meal_data = []
-    processed_dates = {}  # 用於追蹤已處理的日期
+    conn = connect_to_db(db_path)
+    try:
+        night_meal = pd.read_sql_query(data_query, conn, params=(class_name, rules['night_meal_threshold_seconds'])) # 班別與門檻皆以查詢參數傳入
+    finally:
+        conn.close()
 
-    for _, row in data.iterrows():
-        account = row['公務帳號']
-        card_no = row['卡號']
-        date_str = row['刷卡日期']  # 格式應為 'YYYY-MM-DD'
-        
-        # 從日期字串中提取月份和日期
-        try:
-            date_obj = datetime.strptime(date_str, '%Y-%m-%d')
-            month = f"{date_obj.month:02}"  # 確保月份為兩位數
-            day = f"{date_obj.day:02}"      # 確保日期為兩位數
-        except ValueError:
-            logging.error(f"無效的日期格式: {date_str}")
-            continue
+    # 刷卡日期已在 SQL 中轉為 YYYYMMDD 整數，無法轉換的資料記錄錯誤後略過
+    is_valid = night_meal['日期數值'].notna()
+    for date_str in night_meal.loc[~is_valid, '刷卡日期']:
+        logging.error(f"無效的日期格式: {date_str}")
+    night_meal = night_meal[is_valid]
+    ymd = night_meal['日期數值'].to_numpy(dtype=np.int64)
 
-        if account not in processed_dates:
-            processed_dates[account] = set()
+    night_meal_df = pd.DataFrame({
+        '卡號': night_meal['卡號'],
+        '公務帳號': night_meal['公務帳號'],
+        '姓名': night_meal['姓名'],
+        '月份': pd.Series(ymd // 100 % 100, index=night_meal.index).astype(str).str.zfill(2), # 以整數運算取出月份，確保為兩位數
+        '日期': pd.Series(ymd % 100, index=night_meal.index).astype(str).str.zfill(2), # 以整數運算取出日期，確保為兩位數
+        '班別': night_meal['班別'],
+        '符合清單': night_meal['公務帳號'].isin(account_list), # 一次判斷所有資料是否符合清單
+    })
 
-        night_meal_recorded = check_night_meal(row, time_columns, rules['night_meal_threshold'])
-        if night_meal_recorded and date_str not in processed_dates[account]:
-            night_meal_data.append([card_no, account, row['姓名'], month, day, row['班別'], account in account_list]) # 將資料加入時順便將班別和是否符合清單資料的判斷結果加入
-            processed_dates[account].add(date_str)
+    # 同一公務帳號同一天只記錄一次
+    return night_meal_df[~night_meal.duplicated(subset=['公務帳號', '刷卡日期'])].values.tolist()
 
-    return night_meal_data
+def escape_html(values: pd.Series) -> pd.Series:
+    """以向量化字串運算跳脫整欄的 HTML 特殊字元，結果與 html.escape 相同"""
+    text = pd.Series(values.to_numpy(dtype=object).astype(str), index=values.index) # 與 f-string 相同，空值輸出為 None 或 nan 而非保留空值
+    return (text
+            .str.replace('&', '&amp;', regex=False)
+            .str.replace('<', '&lt;', regex=False)
+            .str.replace('>', '&gt;', regex=False)
+            .str.replace('"', '&quot;', regex=False)
+            .str.replace("'", '&#x27;', regex=False))
 
-def check_night_meal(row: pd.Series, time_columns: List[str], night_meal_threshold: datetime.time) -> bool:
-    """檢查是否有夜間餐費記錄
-    Args:
-        row (pd.Series): 打卡紀錄
-        time_columns (List[str]): 所有時間欄位名稱的列表
-        night_meal_threshold (datetime.time): 夜點門檻時間
-    Returns:
-        bool: True 如果符合夜點資格，否則 False
-    """
-    for col in time_columns[::-1]: # 反向迭代時間欄位，以取得最後一次打卡時間
-        if not pd.isna(row[col]): # 如果該時間欄位有值
-            last_time_str = row[col]  # 取出最後一次打卡時間字串
-            if len(last_time_str) == 6:
-                last_time_str = f"{last_time_str[:2]}:{last_time_str[2:4]}:{last_time_str[4:6]}"
-            last_time = datetime.strptime(last_time_str, '%H:%M:%S').time() # 將最後一次打卡時間轉為 datetime.time 物件
-            return last_time > night_meal_threshold # 如果最後一次打卡時間大於門檻時間則回傳True
-    return False
-
-def generate_html_table(night_meal_summary: pd.DataFrame, class_name: str) -> str:
-    """產生夜點結果的 HTML 表格
+def weekday_css_class(weekday: int) -> str:
+    """取得星期對應的欄位樣式：週三與週日為 wed-sun-col，週六為 sat-col，其餘無樣式"""
+    if weekday == 2 or weekday == 6:
+        return "wed-sun-col"
+    if weekday == 5:
+        return "sat-col"
+    return ""
+
+# 每個月份表格的標題與表格開頭，只代入班別與月份
+MONTH_TITLE_TEMPLATE = """
+        <h2>{class_name} {month}月夜點紀錄</h2>
+        <table class='night-meal-table'>
+            <thead>
+                <tr>
+        """
+# 日期以外的固定欄位表頭與表格結尾
+SUMMARY_HEADER = "<th>卡號</th><th>公務帳號</th><th>班別</th><th>姓名</th><th>總天數</th><th>月份</th>"
+TABLE_CLOSE = "</tbody></table><br>"
+
+@lru_cache(maxsize=16)
+def month_layout(year: int, month: int) -> Tuple[Tuple[str, ...], Tuple[str, ...], str]:
+    """取得指定年月的日期版面，依 (年, 月) 快取，各班別同一月份共用同一份結果
     Args:
-        night_meal_summary (pd.DataFrame): 夜點彙總資料
-        class_name (str): 班別名稱
+        year (int): 年份
+        month (int): 月份
     Returns:
-        str: HTML 表格字串
+        Tuple[Tuple[str, ...], Tuple[str, ...], str]: 兩位數日期字串、各日期的星期樣式、含固定欄位與日期的表頭 HTML
     """
-    # CSS 樣式
-    css_style = """
+    num_days = monthrange(year, month)[1]
+    day_strs = tuple(f"{day:02}" for day in range(1, num_days + 1))
+    td_classes = tuple(weekday_css_class(date(year, month, day).weekday()) for day in range(1, num_days + 1))
+    day_header = "".join(f"<th class='{td_class}'>{day_str}</th>" if td_class else f"<th>{day_str}</th>" for day_str, td_class in zip(day_strs, td_classes))
+    return day_strs, td_classes, SUMMARY_HEADER + day_header + "</tr></thead><tbody>"
+
+# CSS 樣式，整份 HTML 檔案只輸出一次
+HTML_CSS = """
     <style>
         .night-meal-table {
             width: 100%;
@@ -220,140 +254,82 @@ def generate_html_table(night_meal_summary: pd.DataFrame, class_name: str) -> st
             color: red;
         }
     </style>
+"""
+
+def iter_html_table(night_meal_summary: pd.DataFrame, class_name: str, report_year: int) -> Iterator[str]:
+    """逐段產生夜點結果的 HTML 表格
+    Args:
+        night_meal_summary (pd.DataFrame): 夜點彙總資料
+        class_name (str): 班別名稱
+        report_year (int): 報表年份，用於決定各月份的天數與星期
+    Yields:
+        str: HTML 表格的片段（不含 <html> 與 CSS），依序寫入檔案即為該班別的所有月份表格
     """
-    
-    html_table = ""
-    
     # 按月份分組處理數據
     for month, month_group in night_meal_summary.groupby('月份'):
         # 從月份字串轉換為整數
         current_month = int(month)
-        current_year = datetime.now().year
-        _, num_days = monthrange(current_year, current_month)
-        
-        # 建立每個月份的表頭
-        month_header = f"""
-        <h2>{class_name} {current_month}月夜點紀錄</h2>
-        <table class='night-meal-table'>
-            <thead>
-                <tr>
-        """
-        
-        # 生成日期表頭
-        month_header += "<th>卡號</th><th>公務帳號</th><th>班別</th><th>姓名</th><th>總天數</th><th>月份</th>"
-        for day in range(1, num_days + 1):
-            day_str = f"{day:02}"
-            weekday = datetime(current_year, current_month, day).weekday()
-            if weekday == 2 or weekday == 6:
-                month_header += f"<th class='wed-sun-col'>{day_str}</th>"
-            elif weekday == 5:
-                month_header += f"<th class='sat-col'>{day_str}</th>"
-            else:
-                month_header += f"<th>{day_str}</th>"
-        month_header += "</tr></thead><tbody>"
+        day_strs, td_classes, table_header = month_layout(report_year, current_month) # 取得該月的日期、星期樣式與欄位表頭
+        num_days = len(day_strs)
+
+        # 建立每個月份的表頭，只有標題需要代入班別與月份，欄位表頭取自該月的快取
+        month_header = MONTH_TITLE_TEMPLATE.format(class_name=html.escape(str(class_name)), month=current_month) + table_header
         
-        month_rows = ""
-        for index, row in month_group.iterrows():
-            html_row = "<tr>"
-            
-            # 基本欄位
-            html_row += f"<td>{row['卡號']}</td>"
-            html_row += f"<td>{row['公務帳號']}</td>"
-            html_row += f"<td>{row['班別']}</td>"
-            
-            if row['符合清單']:
-                html_row += f"<td class='driver-name'>* {row['姓名']}</td>"
-            else:
-                html_row += f"<td>{row['姓名']}</td>"
-
-            # 計算日期總數
-            dates = []
-            if not pd.isna(row['日期列表']):
-                dates = [d.strip() for d in row['日期列表'].split(",")]
-            total_days = len(dates)
-            html_row += f"<td class='total-days'>{total_days}</td>"
-            html_row += f"<td>{row['月份']}</td>"
-
-            # 生成日期格子
-            for day in range(1, num_days + 1):
-                day_str = f"{day:02}"
-                is_filled = any(day_str == d for d in dates)
-                weekday = datetime(current_year, current_month, day).weekday()
-                
-                if weekday == 2 or weekday == 6:
-                    td_class = "wed-sun-col"
-                    date_class = "date-box"
-                    if is_filled:
-                        date_class += " filled"
-                elif weekday == 5:
-                    td_class = "sat-col"
-                    date_class = "date-box"
-                    if is_filled:
-                        date_class += " filled"
-                else:
-                    td_class = ""
-                    date_class = "date-box"
-                    if is_filled:
-                        date_class += " filled"
-                
-                html_row += f'<td class="{td_class}"><div class="{date_class}">{day_str if is_filled else ""}</div></td>'
-            
-            html_row += "</tr>"
-            month_rows += html_row
+        # 以整欄字串運算組出整個月份每一列的固定欄位，日期格子於下方逐日附加
+        names = escape_html(month_group['姓名'])
+        rows = ("<tr><td>" + escape_html(month_group['卡號']) + "</td><td>" + escape_html(month_group['公務帳號'])
+                + "</td><td>" + escape_html(month_group['班別']) + "</td>"
+                + np.where(month_group['符合清單'].astype(bool), "<td class='driver-name'>* " + names + "</td>", "<td>" + names + "</td>")
+                + "<td class='total-days'>" + month_group['總天數'].astype(str) + "</td>"
+                + "<td>" + month_group['月份'].astype(str) + "</td>")
+
+        # 由日期位元遮罩展開為「列 × 日」的布林矩陣，每一格只需一次位移運算
+        masks = month_group['日期遮罩'].to_numpy(dtype=np.uint32)
+        fill = ((masks[:, None] >> np.arange(1, num_days + 1, dtype=np.uint32)) & 1).astype(bool)
+
+        # 生成日期格子，每一天對整個月份的資料做一次判斷
+        for day_index, (day_str, td_class) in enumerate(zip(day_strs, td_classes)):
+            rows = rows + np.where(fill[:, day_index],
+                                   f'<td class="{td_class}"><div class="date-box filled">{day_str}</div></td>',
+                                   f'<td class="{td_class}"><div class="date-box"></div></td>')
+
+        month_rows = "".join(rows + "</tr>")
         
-        html_table += month_header + month_rows + "</tbody></table><br>"
-
-    html_content = f"""
-    <html>
-    <head>
-        <title>{class_name} 夜點紀錄</title>
-        {css_style}
-    </head>
-    <body>
-        {html_table}
-    </body>
-    </html>
-    """
-    
-    return html_content
+        yield month_header
+        yield month_rows
+        yield TABLE_CLOSE
 
 
-def output_night_meal_results(output_dir: str, night_meal_data: List):
+def output_night_meal_results(output_dir: str, night_meal_data: List, today: date):
     """輸出夜點結果到 HTML 文件
     Args:
         output_dir (str): 輸出資料夾路徑
         night_meal_data (List): 符合夜點資格的資料列表, 包含 `卡號`, `公務帳號`, `姓名`, `月份`, `日期`, `班別`, `是否符合清單`
+        today (date): 執行當天日期，整份報表共用同一個年份
     """
     night_meal_df = pd.DataFrame(night_meal_data, columns=['卡號', '公務帳號', '姓名', '月份', '日期', '班別', '符合清單'])
     
-    # 使用 SQL 查詢進行分組和彙總
-    query = f"""
-        SELECT
-            卡號,
-            公務帳號,
-            班別,
-            姓名,
-            月份,
-            GROUP_CONCAT(日期, ', ') AS 日期列表,
-            MAX(符合清單) as 符合清單
-        FROM
-            (SELECT * from night_meal_df ORDER BY 日期)
-        GROUP BY
-            卡號, 公務帳號, 班別, 姓名, 月份
-        ORDER BY 班別, 卡號, 月份
-    """
-    
-    conn = sqlite3.connect(':memory:') # 建立一個暫存的 SQLite 資料庫
-    night_meal_df.to_sql('night_meal_df', conn, if_exists='replace', index=False)  # 將 night_meal_df 資料寫入暫存資料庫
-    night_meal_summary = pd.read_sql_query(query, conn)  # 從暫存資料庫查詢分組和彙總的資料
-    conn.close() # 關閉暫存的資料庫連線
-    
-    html_content = ""
-    for class_name, group in night_meal_summary.groupby('班別'): # 按照班別分組，然後迭代
-        html_content += generate_html_table(group, class_name) # 針對每一個分組產生 HTML 表格
+    # 將每個日期轉為位元（第 d 位代表 d 日）；同一人同月重複出現的日期（如不同年份的同一天）只保留第一筆的位元，
+    # 使各日期位元互不重疊，加總即等同位元 OR，得到該月的日期位元遮罩
+    day_bits = np.left_shift(np.uint32(1), night_meal_df['日期'].astype(np.uint32).to_numpy())
+    is_first_day = ~night_meal_df.duplicated(subset=['卡號', '公務帳號', '班別', '姓名', '月份', '日期']).to_numpy()
+    night_meal_df['日期遮罩'] = np.where(is_first_day, day_bits, np.uint32(0))
+
+    # 依人員與月份分組，統計天數、合併日期位元遮罩並判斷是否符合清單
+    night_meal_summary = (
+        night_meal_df
+        .groupby(['卡號', '公務帳號', '班別', '姓名', '月份'], dropna=False)
+        .agg(總天數=('日期', 'size'), 日期遮罩=('日期遮罩', 'sum'), 符合清單=('符合清單', 'max')) # 總天數為去除同人同日重複後的筆數，不同年份的同一天分別計算
+        .reset_index()
+        .sort_values(['班別', '卡號', '月份'], kind='stable', na_position='first')
+    )
     
-    with open(os.path.join(output_dir, 'night_meal_records.html'), 'w', encoding='utf-8') as f:
-        f.write(f"""<html><head><title>夜點總表</title></head><body>{html_content}</body></html>""") # 將 HTML 內容寫入檔案
+    # 邊產生邊寫入檔案，不在記憶體中累積整份 HTML
+    with open(os.path.join(output_dir, 'night_meal_records.html'), 'w', encoding='utf-8', buffering=1 << 20) as f: # 1MB 寫入緩衝，減少系統呼叫次數
+        f.write(f"<html><head><title>夜點總表</title>{HTML_CSS}</head><body>")
+        for class_name, group in night_meal_summary.groupby('班別'): # 按照班別分組，然後迭代
+            f.writelines(iter_html_table(group, class_name, today.year)) # 針對每一個分組產生 HTML 表格並直接寫入
+        f.write("</body></html>")
     
 
 
@@ -365,6 +341,7 @@ def main(db_path: str, output_dir: str, list_path: str):
         list_path (str): 清單資料檔案路徑
     """
     os.makedirs(output_dir, exist_ok=True)  # 建立輸出資料夾，如果已存在則不產生錯誤
+    today = date.today()  # 只取一次當天日期，避免跨年執行時各班別使用不同年份
     
     try:
         conn = connect_to_db(db_path)  # 連接到資料庫
@@ -372,23 +349,27 @@ def main(db_path: str, output_dir: str, list_path: str):
 
         # 讀取清單資料
         try:
-            list_df = pd.read_csv(list_path)
-            account_list = set(list_df['公務帳號']) # 將清單資料的公務帳號讀取出來轉為 set
+            account_list = frozenset(pd.read_csv(list_path, usecols=['公務帳號'], dtype=str)['公務帳號'].dropna()) # 只讀取清單資料的公務帳號欄位並轉為 frozenset
             logging.info(f"已讀取清單資料，共 {len(account_list)} 筆資料")
         except Exception as e:
             logging.error(f"讀取清單資料錯誤: {e}")
-            account_list = set() # 如果清單資料讀取失敗則使用空set
+            account_list = frozenset() # 如果清單資料讀取失敗則使用空 frozenset
 
         rules_dict = create_rules_dict(conn) # 建立班別規則字典
         time_columns = get_time_columns(cursor)  # 取得所有時間欄位名稱
         
+        # 各班別的處理彼此獨立，分散到多個行程並行執行
         all_night_meal_data = []
-        for class_name, rules in rules_dict.items(): # 迭代每一個班別規則
-            logging.info(f"處理班別名稱: {rules['class_name']}")
-            night_meal_data = process_night_meal_data(conn, class_name, rules, time_columns, account_list) # 處理特定班別的夜點資料
-            all_night_meal_data.extend(night_meal_data) # 將資料加入到總列表中
+        with ProcessPoolExecutor(max_workers=max(1, min(8, len(rules_dict)))) as executor:
+            futures = []
+            for class_name, rules in rules_dict.items(): # 迭代每一個班別規則
+                logging.info(f"處理班別名稱: {rules['class_name']}")
+                futures.append(executor.submit(process_night_meal_data, db_path, class_name, rules, time_columns, account_list)) # 處理特定班別的夜點資料
+
+            for future in futures: # 依班別順序收集結果
+                all_night_meal_data.extend(future.result()) # 將資料加入到總列表中
 
-        output_night_meal_results(output_dir, all_night_meal_data)  # 輸出夜點資料到 HTML 檔案
+        output_night_meal_results(output_dir, all_night_meal_data, today)  # 輸出夜點資料到 HTML 檔案
 
     except Exception as e:
         logging.error(f"處理過程中發生錯誤: {e}") # 記錄處理過程中的錯誤
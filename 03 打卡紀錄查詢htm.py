@@ -1,9 +1,11 @@
 import sqlite3
 import pandas as pd
 import os
+import html
 import logging
 from datetime import datetime
-from typing import List
+from typing import Iterator, List, Tuple
+from functools import lru_cache
 import argparse
 from calendar import monthrange
 
@@ -35,53 +37,78 @@ logger = setup_logging()
 def get_db_connection():
     """連接到資料庫"""
     try:
-        return sqlite3.connect(db_path)
+        conn = sqlite3.connect(db_path)
+        conn.execute("PRAGMA temp_store=MEMORY")  # 暫存表與排序放在記憶體
+        conn.execute("PRAGMA cache_size=-65536")  # 頁面快取約 64MB
+        return conn
     except Exception as e:
         logger.error(f"數據庫連接錯誤: {str(e)}")
         return None
 
-def get_time_columns():
-    """獲取所有刷卡時間欄位"""
+@lru_cache(maxsize=8)
+def _time_columns_cached(db_file: str, mtime: float) -> Tuple[str, ...]:
+    """讀取刷卡時間欄位，依資料庫路徑與修改時間快取，資料庫重建後快取自動失效"""
+    conn = sqlite3.connect(db_file)
     try:
-        conn = get_db_connection()
-        if conn is None:
-            return []
-        
         cursor = conn.cursor()
         cursor.execute("PRAGMA table_info(integrated_punch)")
         columns_info = cursor.fetchall()
-        time_columns = [col[1] for col in columns_info if col[1].startswith('刷卡時間')]
+        return tuple(col[1] for col in columns_info if col[1].startswith('刷卡時間'))
+    finally:
         conn.close()
-        return time_columns
+
+def get_time_columns():
+    """獲取所有刷卡時間欄位"""
+    try:
+        return list(_time_columns_cached(db_path, os.path.getmtime(db_path)))
     except Exception as e:
         logger.error(f"獲取時間列時發生錯誤: {str(e)}")
         return []
 
-def format_timestamp(ts):
-    """格式化時間戳記字串"""
-    if pd.isna(ts):
-        return None
-    ts = str(ts).strip()
-    if not ts:
-        return None
-    if ':' in ts:
-        return ts
-    if len(ts) == 6:
-        return f"{ts[:2]}:{ts[2:4]}:{ts[4:6]}"
-    return ts
+def format_timestamp_sql(col: str) -> str:
+    """產生在 SQL 中格式化時間戳記欄位的運算式：HHMMSS 轉為 HH:MM:SS，空白或空值轉為 NULL"""
+    return f"""CASE
+            WHEN TRIM({col}) = '' THEN NULL
+            WHEN LENGTH(TRIM({col})) = 6 AND INSTR({col}, ':') = 0 THEN
+                SUBSTR(TRIM({col}), 1, 2) || ':' || SUBSTR(TRIM({col}), 3, 2) || ':' || SUBSTR(TRIM({col}), 5, 2)
+            ELSE TRIM({col})
+        END AS {col}"""
 
-def generate_html_table(df: pd.DataFrame, date_str: str, class_name: str) -> str:
-    """
-    產生打卡記錄的 HTML 表格
+# 時間戳記的開頭標籤，以 (序號 + 1) & 1 索引：0 為偶數、1 為奇數
+SPAN_OPEN = ("<span class='timestamp-even'>", "<span class='timestamp-odd'>")
+SPAN_CLOSE = '</span>'
+
+def format_timestamp_spans(timestamps: pd.Series) -> pd.Series:
+    """將整欄時間戳記文字依照奇數或偶數加上不同顏色的 span
     Args:
-        df (pd.DataFrame): 包含打卡記錄的 DataFrame
-        date_str (str): 日期字串，用於標題
-        class_name (str): 班別名稱，用於標題
+        timestamps (pd.Series): 以 ', ' 分隔的時間戳記字串
     Returns:
-        str: HTML 表格字串
+        pd.Series: 以空白分隔的 span 字串，索引與輸入相同
     """
-    # CSS 樣式
-    css_style = """
+    # 拆成寬表後同一欄的奇偶顏色相同，逐欄（次數約為每日最多打卡次數）以整欄運算包上標籤
+    timestamp_columns = timestamps.fillna('').str.split(', ', expand=True)
+    spans = pd.DataFrame({
+        i: (SPAN_OPEN[(i + 1) & 1] + timestamp_columns[i] + SPAN_CLOSE).where(timestamp_columns[i].fillna('').ne(''))  # 空白時間戳記不輸出標籤
+        for i in timestamp_columns.columns
+    }, index=timestamps.index)
+    return (
+        spans.stack().dropna()
+        .groupby(level=0).agg(' '.join)
+        .reindex(timestamps.index, fill_value='')
+    )
+
+def escape_html(values: pd.Series) -> pd.Series:
+    """以向量化字串運算跳脫整欄的 HTML 特殊字元，結果與 html.escape 相同"""
+    text = pd.Series(values.to_numpy(dtype=object).astype(str), index=values.index) # 與 f-string 相同，空值輸出為 None 或 nan 而非保留空值
+    return (text
+            .str.replace('&', '&amp;', regex=False)
+            .str.replace('<', '&lt;', regex=False)
+            .str.replace('>', '&gt;', regex=False)
+            .str.replace('"', '&quot;', regex=False)
+            .str.replace("'", '&#x27;', regex=False))
+
+# CSS 樣式，整份 HTML 檔案只輸出一次
+HTML_CSS = """
     <style>
         .punch-record-table {
             width: 100%;
@@ -120,16 +147,20 @@ def generate_html_table(df: pd.DataFrame, date_str: str, class_name: str) -> str
             color:#333
         }
     </style>
+"""
+
+def iter_html_table(df: pd.DataFrame, date_str: str, class_name: str) -> Iterator[str]:
     """
-    
-    html_header = f"""
-    <html>
-    <head>
-        <title>{class_name} 打卡記錄 - {date_str}</title>
-        {css_style}
-    </head>
-    <body>
-        <h2>{class_name} - {date_str} 打卡記錄</h2>
+    逐段產生打卡記錄的 HTML 表格
+    Args:
+        df (pd.DataFrame): 包含打卡記錄的 DataFrame
+        date_str (str): 日期字串，用於標題
+        class_name (str): 班別名稱，用於標題
+    Yields:
+        str: HTML 表格的片段（不含 <html> 與 CSS），依序寫入檔案即為該班別的表格
+    """
+    yield f"""
+        <h2>{html.escape(str(class_name))} - {html.escape(date_str)} 打卡記錄</h2>
         <table class='punch-record-table'>
             <thead>
                 <tr>
@@ -143,37 +174,16 @@ def generate_html_table(df: pd.DataFrame, date_str: str, class_name: str) -> str
             <tbody>
     """
     
-    html_table = ""
-    for index, row in df.iterrows():
-        html_row = "<tr>"
-        html_row += f"<td>{row['卡號']}</td>"
-        html_row += f"<td>{row['公務帳號']}</td>"
-        html_row += f"<td>{row['姓名']}</td>"
-        html_row += f"<td>{row['打卡次數']}</td>"
-        
-        # 將時間戳記文字依照奇數或偶數改變顏色
-        timestamp_str = row['所有時間戳記']
-        formatted_timestamps = []
-        
-        for i, ts in enumerate(timestamp_str.split(', ')):
-            if not ts:
-               continue
-            if (i + 1) % 2 == 0:
-                formatted_timestamps.append(f"<span class='timestamp-even'>{ts}</span>")
-            else:
-                formatted_timestamps.append(f"<span class='timestamp-odd'>{ts}</span>")
-        
-        html_row += f"<td class='timestamp-col'>{' '.join(formatted_timestamps)}</td>"
-        html_row += "</tr>"
-        html_table += html_row
+    # 以整欄字串運算組出每一列的 HTML，再逐列產出
+    rows = ("<tr><td>" + escape_html(df['卡號']) + "</td><td>" + escape_html(df['公務帳號'])
+            + "</td><td>" + escape_html(df['姓名']) + "</td><td>" + df['打卡次數'].astype(str) + "</td>"
+            + "<td class='timestamp-col'>" + format_timestamp_spans(df['所有時間戳記']) + "</td></tr>")
+    yield from rows
 
-    html_footer = """
+    yield """
                 </tbody>
             </table>
-        </body>
-    </html>
     """
-    return html_header + html_table + html_footer
     
 def export_punch_record(date_str=None, gui_mode=False):
     """
@@ -198,47 +208,51 @@ def export_punch_record(date_str=None, gui_mode=False):
             msg = "無法獲取時間欄位"
             logger.error(msg)
             return msg if gui_mode else None
+
+        # 只保留查詢日期當天有打卡資料的時間欄位，減少讀取與串接的欄位數
+        non_empty_checks = [f"MAX(TRIM({col}) <> '')" for col in time_columns]
+        has_values = conn.execute(
+            f"SELECT {', '.join(non_empty_checks)} FROM integrated_punch WHERE strftime('%m-%d', 刷卡日期) = ?",
+            (date_str,)
+        ).fetchone()
+        time_columns = [col for col, present in zip(time_columns, has_values) if present] or time_columns[:1]  # 至少保留一個欄位讓查詢語法成立
             
-        # 查詢數據
+        # 查詢數據，並在 SQL 中依欄位順序串接所有時間戳記及計算打卡次數
         data_query = f"""
         SELECT 
-            ip.班別,
-            ip.卡號,
-            ip.公務帳號,
-            ip.姓名,
-            ip.刷卡日期,
-            {', '.join(time_columns)}
-        FROM integrated_punch ip
-        WHERE strftime('%m-%d', ip.刷卡日期) = ?
-        ORDER BY ip.班別 ASC, ip.卡號 ASC
+            班別,
+            卡號,
+            公務帳號,
+            姓名,
+            刷卡日期,
+            {' + '.join(f'({col} IS NOT NULL)' for col in time_columns)} AS 打卡次數,
+            SUBSTR({' || '.join(f"IFNULL(', ' || {col}, '')" for col in time_columns)}, 3) AS 所有時間戳記
+        FROM (
+            SELECT 
+                ip.班別,
+                ip.卡號,
+                ip.公務帳號,
+                ip.姓名,
+                ip.刷卡日期,
+                {', '.join(format_timestamp_sql(col) for col in time_columns)}
+            FROM integrated_punch ip
+            WHERE strftime('%m-%d', ip.刷卡日期) = ?
+        )
+        ORDER BY 班別 ASC, 卡號 ASC
         """
         
         try:
             df = pd.read_sql_query(data_query, conn, params=(date_str,))
             
-            # 格式化時間戳記
-            for col in time_columns:
-                df[col] = df[col].map(format_timestamp)
-            
-            # 合併所有時間戳記
-            df['所有時間戳記'] = df[time_columns].apply(
-                lambda row: ', '.join([t for t in row if pd.notna(t)]), axis=1
-            )
-            
-            # 計算打卡次數
-            df['打卡次數'] = df[time_columns].apply(
-                lambda row: sum(1 for t in row if pd.notna(t)), axis=1
-            )
-            
             # 輸出到HTML
             output_file = os.path.join(output_dir, f'punch_record_{date_str}.html')
-            html_content = ""
-            for class_name, group in df.groupby('班別'):  # 按照班別分組，然後迭代
-                result_df = group[['卡號', '公務帳號', '姓名', '打卡次數', '所有時間戳記']]  # 只保留需要的欄位
-                html_content += generate_html_table(result_df, date_str, class_name)  # 為每個班別生成一個表格
-
             with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(html_content)  # 將所有表格寫入同一個HTML檔案
+                f.write(f"<html><head><title>打卡記錄 - {html.escape(date_str)}</title>{HTML_CSS}</head><body>")
+                for class_name, group in df.groupby('班別'):  # 按照班別分組，然後迭代
+                    result_df = group[['卡號', '公務帳號', '姓名', '打卡次數', '所有時間戳記']]  # 只保留需要的欄位
+                    for chunk in iter_html_table(result_df, date_str, class_name):  # 為每個班別生成一個表格
+                        f.write(chunk)  # 邊產生邊寫入同一個HTML檔案，不在記憶體中累積整份內容
+                f.write("</body></html>")
             
             # 準備返回訊息
             record_count = len(df)
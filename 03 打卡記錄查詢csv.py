@@ -3,6 +3,8 @@ import pandas as pd
 import os
 import logging
 from datetime import datetime
+from typing import Tuple
+from functools import lru_cache
 
 def setup_logging():
     """設置日誌系統"""
@@ -32,28 +34,43 @@ logger = setup_logging()
 def get_db_connection():
     """連接到資料庫"""
     try:
-        return sqlite3.connect(db_path)
+        conn = sqlite3.connect(db_path)
+        conn.execute("PRAGMA temp_store=MEMORY")  # 暫存表與排序放在記憶體
+        conn.execute("PRAGMA cache_size=-65536")  # 頁面快取約 64MB
+        return conn
     except Exception as e:
         logger.error(f"數據庫連接錯誤: {str(e)}")
         return None
 
-def get_time_columns():
-    """獲取所有刷卡時間欄位"""
+@lru_cache(maxsize=8)
+def _time_columns_cached(db_file: str, mtime: float) -> Tuple[str, ...]:
+    """讀取刷卡時間欄位，依資料庫路徑與修改時間快取，資料庫重建後快取自動失效"""
+    conn = sqlite3.connect(db_file)
     try:
-        conn = get_db_connection()
-        if conn is None:
-            return []
-        
         cursor = conn.cursor()
         cursor.execute("PRAGMA table_info(integrated_punch)")
         columns_info = cursor.fetchall()
-        time_columns = [col[1] for col in columns_info if col[1].startswith('刷卡時間')]
+        return tuple(col[1] for col in columns_info if col[1].startswith('刷卡時間'))
+    finally:
         conn.close()
-        return time_columns
+
+def get_time_columns():
+    """獲取所有刷卡時間欄位"""
+    try:
+        return list(_time_columns_cached(db_path, os.path.getmtime(db_path)))
     except Exception as e:
         logger.error(f"獲取時間列時發生錯誤: {str(e)}")
         return []
 
+def format_timestamp_sql(col: str) -> str:
+    """產生在 SQL 中格式化時間戳記欄位的運算式：HHMMSS 轉為 HH:MM:SS，空白或空值轉為 NULL"""
+    return f"""CASE
+            WHEN TRIM({col}) = '' THEN NULL
+            WHEN LENGTH(TRIM({col})) = 6 AND INSTR({col}, ':') = 0 THEN
+                SUBSTR(TRIM({col}), 1, 2) || ':' || SUBSTR(TRIM({col}), 3, 2) || ':' || SUBSTR(TRIM({col}), 5, 2)
+            ELSE TRIM({col})
+        END AS {col}"""
+
 def export_punch_record(date_str=None, gui_mode=False):
     """
     匯出打卡記錄到CSV檔案
@@ -77,47 +94,39 @@ def export_punch_record(date_str=None, gui_mode=False):
             msg = "無法獲取時間欄位"
             logger.error(msg)
             return msg if gui_mode else None
+
+        # 只保留查詢日期當天有打卡資料的時間欄位，減少讀取與串接的欄位數
+        non_empty_checks = [f"MAX(TRIM({col}) <> '')" for col in time_columns]
+        has_values = conn.execute(
+            f"SELECT {', '.join(non_empty_checks)} FROM integrated_punch WHERE strftime('%m-%d', 刷卡日期) = ?",
+            (date_str,)
+        ).fetchone()
+        time_columns = [col for col, present in zip(time_columns, has_values) if present] or time_columns[:1]  # 至少保留一個欄位讓查詢語法成立
             
-        # 查詢數據
+        # 查詢數據，並在 SQL 中依欄位順序串接所有時間戳記
         data_query = f"""
         SELECT 
-            ip.班別,
-            ip.卡號,
-            ip.姓名,
-            ip.刷卡日期,
-            {', '.join(time_columns)}
-        FROM integrated_punch ip
-        WHERE strftime('%m-%d', ip.刷卡日期) = ?
-        ORDER BY ip.班別 ASC, ip.卡號 ASC
+            班別,
+            卡號,
+            姓名,
+            刷卡日期,
+            SUBSTR({' || '.join(f"IFNULL(', ' || {col}, '')" for col in time_columns)}, 3) AS 所有時間戳記
+        FROM (
+            SELECT 
+                ip.班別,
+                ip.卡號,
+                ip.姓名,
+                ip.刷卡日期,
+                {', '.join(format_timestamp_sql(col) for col in time_columns)}
+            FROM integrated_punch ip
+            WHERE strftime('%m-%d', ip.刷卡日期) = ?
+        )
+        ORDER BY 班別 ASC, 卡號 ASC
         """
         
         try:
             df = pd.read_sql_query(data_query, conn, params=(date_str,))
             
-            # 格式化時間戳記
-            def format_timestamp(ts):
-                if pd.isna(ts):
-                    return None
-                ts = str(ts).strip()
-                if not ts:
-                    return None
-                # 如果已經是 HH:MM:SS 格式就直接返回
-                if ':' in ts:
-                    return ts
-                # 如果是 HHMMSS 格式則轉換
-                if len(ts) == 6:
-                    return f"{ts[:2]}:{ts[2:4]}:{ts[4:6]}"
-                return ts
-
-            # 處理所有時間欄位
-            for col in time_columns:
-                df[col] = df[col].map(format_timestamp)
-            
-            # 合併所有時間戳記
-            df['所有時間戳記'] = df[time_columns].apply(
-                lambda row: ', '.join([t for t in row if pd.notna(t)]), axis=1
-            )
-            
             # 只保留需要的欄位
             result_df = df[['班別', '卡號', '姓名', '所有時間戳記']]
             
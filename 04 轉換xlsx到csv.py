@@ -3,8 +3,11 @@ import os
 import tkinter as tk
 from tkinter import ttk, messagebox
 import logging
-from typing import List, Dict
+from typing import List, Dict, Tuple
 from pathlib import Path
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
 # 設置日誌
 logging.basicConfig(
@@ -106,53 +109,24 @@ class ExcelConverterGUI:
             return
         
         selected_files = [self.file_listbox.get(idx) for idx in selected_indices]
-        success_count = 0
-        error_count = 0
         save_mode = self.save_mode.get()
         
+        # 在背景執行緒中轉換，避免讀取 Excel 時視窗停止回應
+        self.convert_button.config(state=tk.DISABLED)
+        threading.Thread(target=self._convert_files, args=(selected_files, save_mode), daemon=True).start()
+    
+    def _convert_files(self, selected_files: List[str], save_mode: str):
+        """以執行緒池同時轉換多個檔案，完成後回到主執行緒顯示結果"""
+        success_count = 0
+        error_count = 0
         all_data = []  # 用於收集所有數據，如果需要合併為司機名單
         
-        for file in selected_files:
-            try:
-                excel_path = os.path.join(self.data_dir, file)
-                # 讀取 Excel 檔案的所有工作表
-                excel_data = pd.ExcelFile(excel_path)
-                
-                for sheet_name in excel_data.sheet_names:
-                    try:
-                        # 讀取工作表
-                        df = pd.read_excel(excel_path, sheet_name=sheet_name)
-                        
-                        # 檢查必要的欄位
-                        required_columns = ['公務帳號', '卡號', '姓名']
-                        missing_columns = [col for col in required_columns if col not in df.columns]
-                        
-                        if missing_columns:
-                            logger.warning(f"工作表 {sheet_name} 缺少必要欄位: {', '.join(missing_columns)}")
-                            continue
-                        
-                        # 只保留必要的欄位
-                        df = df[required_columns]
-                        
-                        if save_mode == "original":
-                            # 使用原始檔名模式
-                            output_name = f"{Path(file).stem}_{sheet_name}.csv"
-                            output_path = os.path.join(self.output_dir, output_name)
-                            df.to_csv(output_path, index=False, encoding='utf-8-sig')
-                            logger.info(f"已將 {file} 的工作表 {sheet_name} 轉換為 {output_name}")
-                        else:
-                            # 收集數據以便後續合併
-                            all_data.append(df)
-                        
-                        success_count += 1
-                        
-                    except Exception as e:
-                        logger.error(f"轉換工作表 {sheet_name} 時發生錯誤: {str(e)}")
-                        error_count += 1
-                
-            except Exception as e:
-                logger.error(f"處理檔案 {file} 時發生錯誤: {str(e)}")
-                error_count += 1
+        # 各檔案的解壓縮與 XML 解析彼此獨立，交由執行緒池並行處理；map 依選擇順序回傳結果
+        with ThreadPoolExecutor(max_workers=min(8, len(selected_files))) as executor:
+            for dfs, success, error in executor.map(partial(self._convert_one, save_mode=save_mode), selected_files):
+                all_data.extend(dfs)
+                success_count += success
+                error_count += error
         
         # 如果是司機名單模式，合併所有數據並儲存
         if save_mode == "driver_list" and all_data:
@@ -167,12 +141,71 @@ class ExcelConverterGUI:
                 logger.error(f"合併資料時發生錯誤: {str(e)}")
                 error_count += 1
         
-        # 顯示結果
+        # 顯示結果（Tk 元件只能在主執行緒操作）
         message = f"轉換完成！\n成功: {success_count} 個工作表\n"
         if error_count > 0:
             message += f"失敗: {error_count} 個工作表"
+        self.window.after(0, self._show_result, message)
+    
+    def _show_result(self, message: str):
+        """顯示轉換結果並重新啟用轉換按鈕"""
+        self.convert_button.config(state=tk.NORMAL)
         messagebox.showinfo("轉換結果", message)
     
+    def _convert_one(self, file: str, save_mode: str) -> Tuple[List[pd.DataFrame], int, int]:
+        """
+        轉換單一 Excel 檔案的所有工作表
+        :param file: Excel 檔案名稱
+        :param save_mode: 儲存模式
+        :return: (司機名單模式下收集的資料, 成功的工作表數, 失敗數)
+        """
+        dfs = []
+        success_count = 0
+        error_count = 0
+        
+        try:
+            excel_path = os.path.join(self.data_dir, file)
+            # 讀取 Excel 檔案的所有工作表
+            excel_data = pd.ExcelFile(excel_path)
+            
+            for sheet_name in excel_data.sheet_names:
+                try:
+                    # 讀取工作表（沿用已開啟的 ExcelFile，避免每個工作表重新解析整個檔案）
+                    df = excel_data.parse(sheet_name=sheet_name)
+                    
+                    # 檢查必要的欄位
+                    required_columns = ['公務帳號', '卡號', '姓名']
+                    missing_columns = [col for col in required_columns if col not in df.columns]
+                    
+                    if missing_columns:
+                        logger.warning(f"工作表 {sheet_name} 缺少必要欄位: {', '.join(missing_columns)}")
+                        continue
+                    
+                    # 只保留必要的欄位
+                    df = df[required_columns]
+                    
+                    if save_mode == "original":
+                        # 使用原始檔名模式
+                        output_name = f"{Path(file).stem}_{sheet_name}.csv"
+                        output_path = os.path.join(self.output_dir, output_name)
+                        df.to_csv(output_path, index=False, encoding='utf-8-sig')
+                        logger.info(f"已將 {file} 的工作表 {sheet_name} 轉換為 {output_name}")
+                    else:
+                        # 收集數據以便後續合併，以類別型別保存重複度高的字串欄位以減少記憶體用量
+                        dfs.append(df.astype('category'))
+                    
+                    success_count += 1
+                    
+                except Exception as e:
+                    logger.error(f"轉換工作表 {sheet_name} 時發生錯誤: {str(e)}")
+                    error_count += 1
+            
+        except Exception as e:
+            logger.error(f"處理檔案 {file} 時發生錯誤: {str(e)}")
+            error_count += 1
+        
+        return dfs, success_count, error_count
+    
     def run(self):
         """執行主程式"""
         self.window.mainloop()
@@ -3,6 +3,8 @@ import os
 import logging
 from datetime import datetime
 import argparse
+from typing import Iterator, TextIO, Tuple
+from functools import lru_cache
 
 # 檢查並安裝必要套件
 try:
@@ -13,6 +15,7 @@ except ImportError:
     print("正在安裝 pandas...")
     subprocess.check_call([sys.executable, "-m", "pip", "install", "pandas"])
     import pandas as pd
+import numpy as np  # 隨 pandas 一併安裝
 
 def setup_logging():
     """設置日誌系統"""
@@ -36,42 +39,46 @@ logger = setup_logging()
 
 def get_db_connection():
     try:
-        return sqlite3.connect(db_path)
+        conn = sqlite3.connect(db_path)
+        conn.execute("PRAGMA temp_store=MEMORY")  # 暫存表與排序放在記憶體
+        conn.execute("PRAGMA cache_size=-200000")  # 頁面快取約 200MB
+        conn.execute("PRAGMA mmap_size=1073741824")  # 以記憶體映射讀取資料庫檔案（最多 1GB）
+        return conn
     except Exception as e:
         logger.error(f"資料庫連接錯誤: {str(e)}")
         return None
 
-def get_time_columns():
-    """獲取所有刷卡時間欄位，兼容簡繁體"""
+@lru_cache(maxsize=8)
+def _time_columns_cached(db_file: str, mtime: float) -> Tuple[str, ...]:
+    """讀取刷卡時間欄位，兼容簡繁體，依資料庫路徑與修改時間快取，資料庫重建後快取自動失效"""
+    conn = sqlite3.connect(db_file)
     try:
-        conn = get_db_connection()
-        if conn is None: return []
-        
         cursor = conn.cursor()
         cursor.execute("PRAGMA table_info(integrated_punch)")
         columns_info = cursor.fetchall()
         
         # 同時匹配簡體和繁體欄位名
-        time_columns = [
+        return tuple(
             col[1] for col in columns_info 
             if col[1].startswith('刷卡時間') or col[1].startswith('刷卡时间')
-        ]
+        )
+    finally:
         conn.close()
-        return time_columns
+
+def get_time_columns():
+    """獲取所有刷卡時間欄位，兼容簡繁體"""
+    try:
+        return list(_time_columns_cached(db_path, os.path.getmtime(db_path)))
     except Exception as e:
         logger.error(f"獲取時間列時發生錯誤: {str(e)}")
         return []
 
-def format_timestamp(ts):
-    if pd.isna(ts): return None
-    ts = str(ts).strip()
-    if not ts: return None
-    if len(ts) == 6: return f"{ts[:2]}:{ts[2:4]}:{ts[4:6]}"
-    return ts if ':' in ts else ts
+def quote_identifier(name: str) -> str:
+    """以雙引號包住 SQL 識別字，並跳脫名稱中的雙引號"""
+    return '"' + name.replace('"', '""') + '"'
 
-def generate_html_table(df: pd.DataFrame) -> str:
-    """生成帶分組結構的HTML表格(以卡號分組，固定欄位寬度，對齊優化)"""
-    css_style = """
+# 報表中固定不變的樣式、搜尋框與搜尋函數，於模組載入時建立一次
+HTML_CSS = """
     <style>
         .account-group {
             border: 2px solid #007bff;
@@ -130,15 +137,15 @@ def generate_html_table(df: pd.DataFrame) -> str:
     </style>
     """
 
-    # 定義搜尋框
-    search_box = """
+# 定義搜尋框
+SEARCH_BOX = """
     <div class="search-box">
         <input type="text" id="searchInput" placeholder="輸入卡號/公務帳號/姓名/班別..." onkeyup="filterGroups()">
     </div>
     """
 
-    # JavaScript 搜尋函數
-    js_script = """
+# JavaScript 搜尋函數
+JS_SCRIPT = """
     <script>
     function filterGroups() {
         const searchTerm = document.getElementById('searchInput').value.toUpperCase();
@@ -152,32 +159,28 @@ def generate_html_table(df: pd.DataFrame) -> str:
     </script>
     """
 
-    html = f"""
+# 星期名稱，以 dayofweek 的整數（0 為星期一）索引
+WEEKDAY_NAMES = np.array(['一', '二', '三', '四', '五', '六', '日'], dtype=object)
+
+# 時間戳記的開頭標籤，以 (序號 + 1) & 1 索引：0 為偶數、1 為奇數
+SPAN_OPEN = np.array(['<span class="timestamp-even">', '<span class="timestamp-odd">'], dtype=object)
+SPAN_CLOSE = '</span>'
+
+# 報表開頭與結尾
+HTML_HEAD = f"""
     <html>
     <head>
         <title>打卡記錄總表（以卡號分組）</title>
-        {css_style}
+        {HTML_CSS}
     </head>
     <body>
         <h2 style="text-align:center; color:#2c3e50;">打卡記錄總表</h2>
-        {search_box}
+        {SEARCH_BOX}
         <div id="content">
     """
 
-    # 以卡號分組處理
-    grouped = df.groupby('卡號')
-    for card_number, group in grouped:
-        # 獲取唯一值
-        unique_accounts = group['公務帳號'].unique()
-        unique_names = group['姓名'].unique()
-        unique_classes = group['班別'].unique()
-        
-        # 轉換為易讀格式
-        accounts_str = '、'.join(map(str, unique_accounts))
-        names_str = '、'.join(map(str, unique_names))
-        classes_str = '、'.join(map(str, unique_classes))
-
-        html += f"""
+# 每個卡號分組的表頭與表格開頭，各分組僅代入卡號、帳號、姓名與班別
+GROUP_HEADER_TEMPLATE = """
         <div class="account-group">
             <div class="account-header">
                 <div class="header-item">卡號：{card_number}</div>
@@ -202,132 +205,142 @@ def generate_html_table(df: pd.DataFrame) -> str:
                 </thead>
                 <tbody>
         """
-        
-        # 填充表格內容
-        for _, row in group.iterrows():
-            timestamps = []
-            for i, ts in enumerate(row['所有時間戳記'].split(', ')):
-                if not ts: continue
-                cls = "timestamp-odd" if (i+1)%2 else "timestamp-even"
-                timestamps.append(f'<span class="{cls}">{ts}</span>')
-            
-            html += f"""
-            <tr>
-                <td>{row['日期']}</td>
-                <td>{row['星期']}</td>
-                <td>{row['打卡次數']}</td>
-                <td class="timestamp-col">{' '.join(timestamps)}</td>
-            </tr>
-            """
-        
-        html += """
+
+GROUP_FOOTER = """
                 </tbody>
             </table>
         </div>
         """
 
-    html += f"""
+HTML_TAIL = f"""
         </div>
-        {js_script}
+        {JS_SCRIPT}
     </body>
     </html>
     """
-    return html
+
+def iter_html_parts(df: pd.DataFrame) -> Iterator[str]:
+    """逐段產生帶分組結構的HTML表格(以卡號分組，固定欄位寬度，對齊優化)，依序串接即為完整HTML"""
+    yield HTML_HEAD
+
+    # 以整欄字串運算組出每一列的 HTML，存於 row_html 欄供各分組直接輸出
+    # 將時間戳記拆成寬表，同一欄的奇偶顏色相同，逐欄（次數約為每日最多打卡次數）以整欄運算包上標籤並串接
+    timestamp_columns = df['所有時間戳記'].str.split(', ', expand=True)
+    timestamps_html = pd.Series('', index=df.index)
+    for i in range(timestamp_columns.shape[1]):
+        timestamps = timestamp_columns[i].fillna('')
+        has_timestamp = timestamps.ne('')
+        spans = (SPAN_OPEN[(i + 1) & 1] + timestamps + SPAN_CLOSE).where(has_timestamp, '')  # 空白時間戳記不輸出標籤
+        separator = np.where(timestamps_html.ne('') & has_timestamp, ' ', '')
+        timestamps_html = timestamps_html + separator + spans
+    df = df.assign(row_html=(
+        "\n            <tr>\n                <td>" + df['日期'].astype(str)
+        + "</td>\n                <td>" + df['星期'].astype(str)
+        + "</td>\n                <td>" + df['打卡次數'].astype(str)
+        + "</td>\n                <td class=\"timestamp-col\">" + timestamps_html
+        + "</td>\n            </tr>\n            "
+    ))
+
+    # 以一次分組運算取得所有卡號的表頭：各欄依出現順序去除重複後轉換為易讀格式
+    headers = {
+        col: (df[['卡號', col]].drop_duplicates()
+              .groupby('卡號', sort=False, observed=True)[col]
+              .agg(lambda values: '、'.join(map(str, values))))
+        for col in ('公務帳號', '姓名', '班別')
+    }
+
+    # 以卡號分組處理（查詢結果已依卡號排序，分組時不需再排序）
+    grouped = df.groupby('卡號', sort=False, observed=True)
+    for card_number, group in grouped:
+        yield GROUP_HEADER_TEMPLATE.format_map({
+            'card_number': card_number,
+            'accounts_str': headers['公務帳號'][card_number],
+            'names_str': headers['姓名'][card_number],
+            'classes_str': headers['班別'][card_number],
+        })
+        
+        # 填充表格內容
+        yield from group['row_html']
+        
+        yield GROUP_FOOTER
+
+    yield HTML_TAIL
+
+def write_html_table(df: pd.DataFrame, fp: TextIO):
+    """將HTML表格邊產生邊寫入已開啟的檔案，記憶體中只保留目前處理的分組"""
+    fp.writelines(iter_html_parts(df))
 
 def export_punch_record():
     try:
         conn = get_db_connection()
         time_columns = get_time_columns()
         
-        # 動態拼接時間欄位，確保無多餘逗號
-        time_fields = ', '.join(time_columns) if time_columns else ''
+        # 動態拼接時間欄位（取自左連接的打卡資料），確保無多餘逗號
+        time_fields = ', '.join(f'p.{quote_identifier(col)}' for col in time_columns) if time_columns else ''
         time_fields = f", {time_fields}" if time_fields else ''
 
-        # 先獲取資料庫中的日期範圍
-        date_range_query = """
-        SELECT 
-            MIN(刷卡日期) as min_date,
-            MAX(刷卡日期) as max_date
-        FROM integrated_punch
-        """
-        date_range = pd.read_sql(date_range_query, conn)
-        min_date = pd.to_datetime(date_range['min_date'].iloc[0])
-        max_date = pd.to_datetime(date_range['max_date'].iloc[0])
-        
-        # 創建完整的日期範圍
-        date_range_df = pd.DataFrame({
-            '日期': pd.date_range(min_date, max_date, freq='D').strftime('%Y-%m-%d'),
-            '星期': pd.date_range(min_date, max_date, freq='D').strftime('%w').map({
-                '0': '日', '1': '一', '2': '二', '3': '三',
-                '4': '四', '5': '五', '6': '六'
-            })
-        })
-
-        # 獲取打卡資料
+        # 在資料庫中以遞迴 CTE 產生完整日期範圍，與每位員工交叉連接後再左連接打卡資料，
+        # 沒有打卡的日期也會以時間欄位皆為空值的列傳回
         query = f"""
+        WITH RECURSIVE dates(d) AS (
+            SELECT date(MIN(刷卡日期)) FROM integrated_punch
+            UNION ALL
+            SELECT date(d, '+1 day') FROM dates
+            WHERE d < (SELECT date(MAX(刷卡日期)) FROM integrated_punch)
+        ),
+        employees AS (
+            SELECT 卡號, 公務帳號, 姓名, 班別, MIN(刷卡日期) AS 首次日期
+            FROM integrated_punch
+            GROUP BY 卡號, 公務帳號, 姓名, 班別
+        )
         SELECT 
-            班別, 
-            卡號, 
-            公務帳號, 
-            姓名,
-            strftime('%Y-%m-%d', 刷卡日期) as 日期,
-            CASE strftime('%w', 刷卡日期)
-                WHEN '0' THEN '日'
-                WHEN '1' THEN '一'
-                WHEN '2' THEN '二'
-                WHEN '3' THEN '三'
-                WHEN '4' THEN '四'
-                WHEN '5' THEN '五'
-                WHEN '6' THEN '六'
-            END as 星期
+            emp.班別, 
+            emp.卡號, 
+            emp.公務帳號, 
+            emp.姓名,
+            dates.d as 日期
             {time_fields}  -- 動態插入時間欄位
-        FROM integrated_punch
-        ORDER BY 公務帳號, 日期
+        FROM employees emp
+        CROSS JOIN dates
+        LEFT JOIN integrated_punch p ON p.卡號 = emp.卡號 AND p.刷卡日期 = dates.d
+        ORDER BY emp.卡號, emp.公務帳號, emp.首次日期, emp.姓名, emp.班別, dates.d
         """
         
-        df = pd.read_sql(query, conn)
+        # 以游標一次取回所有資料，依欄轉置後建立 DataFrame
+        cursor = conn.execute(query)
+        cursor.arraysize = 10000
+        column_names = [desc[0] for desc in cursor.description]
+        columns = list(zip(*cursor.fetchall())) or [()] * len(column_names)
+        df = pd.DataFrame({name: list(values) for name, values in zip(column_names, columns)})
+
+        # 由 ISO 格式日期取得星期幾（0 為星期一），直接索引中文星期名稱
+        weekday = pd.to_datetime(df['日期'], format='%Y-%m-%d').dt.dayofweek
+        df['星期'] = WEEKDAY_NAMES[weekday.to_numpy(dtype=np.int64)]
+
+        # 重複度高的員工資訊與星期欄位轉為類別型別，減少記憶體並讓分組以整數代碼雜湊
+        for col in ('班別', '卡號', '公務帳號', '姓名', '星期'):
+            df[col] = df[col].astype('category')
         
-        # 處理時間戳
+        # 處理時間戳：以整欄字串運算將 HHMMSS 轉為 HH:MM:SS，空白轉為空值
         for col in time_columns:
-            df[col] = df[col].map(format_timestamp)
+            ts = df[col].astype('string').str.strip()
+            is_hhmmss = (ts.str.len() == 6).fillna(False)
+            ts = ts.mask(is_hhmmss, ts.str[:2] + ':' + ts.str[2:4] + ':' + ts.str[4:6])
+            df[col] = ts.replace('', pd.NA)
         
-        df['所有時間戳記'] = df[time_columns].apply(
-            lambda x: ', '.join([t for t in x if pd.notna(t)]), axis=1)
-        
-        df['打卡次數'] = df[time_columns].apply(
-            lambda x: sum(1 for t in x if pd.notna(t)), axis=1)
+        # 串接每一列有值的時間戳記，並計算打卡次數
+        time_df = df[time_columns]
+        df['所有時間戳記'] = (
+            time_df.stack().dropna()
+            .groupby(level=0).agg(', '.join)
+            .reindex(df.index, fill_value='')
+        )
+        df['打卡次數'] = time_df.notna().sum(axis=1).astype('int32')
 
-        # 獲取所有唯一的員工資訊
-        employees = df[['卡號', '公務帳號', '姓名', '班別']].drop_duplicates()
-        
-        # 為每個員工創建完整的日期記錄
-        complete_records = []
-        for _, emp in employees.iterrows():
-            # 複製日期範圍並添加員工資訊
-            emp_dates = date_range_df.copy()
-            for col, val in emp.items():
-                emp_dates[col] = val
-            
-            # 合併打卡資料
-            emp_dates = emp_dates.merge(
-                df[df['卡號'] == emp['卡號']][['日期', '所有時間戳記', '打卡次數']],
-                on='日期',
-                how='left'
-            )
-            
-            # 填充空值
-            emp_dates['所有時間戳記'] = emp_dates['所有時間戳記'].fillna('')
-            emp_dates['打卡次數'] = emp_dates['打卡次數'].fillna(0)
-            
-            complete_records.append(emp_dates)
-        
-        # 合併所有記錄
-        final_df = pd.concat(complete_records, ignore_index=True)
-        
         # 生成HTML文件
         output_file = os.path.join(output_dir, 'punch_by_account.html')
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(generate_html_table(final_df))
+        with open(output_file, 'w', encoding='utf-8', buffering=1 << 20) as fp:  # 1MB 寫入緩衝，減少系統呼叫次數
+            write_html_table(df, fp)
         
         logger.info(f"文件已生成：{output_file}")
         
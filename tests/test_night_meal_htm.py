@@ -0,0 +1,86 @@
+import importlib.util
+import re
+import sqlite3
+import tempfile
+import unittest
+from datetime import date
+from pathlib import Path
+
+SCRIPT = Path(__file__).resolve().parent.parent / '02 新夜點清單htm_0120.py'
+
+
+def load_script():
+    """載入檔名含空白與中文的夜點清單腳本"""
+    spec = importlib.util.spec_from_file_location('night_meal_htm', SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+night_meal = load_script()
+
+
+class NightMealHtmlTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.tmp_dir.name)
+        self.db_path = str(self.tmp_path / 'source.db')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def build_db(self, time_columns, rows):
+        conn = sqlite3.connect(self.db_path)
+        columns = ', '.join(['公務帳號', '卡號', '姓名', '班別', '刷卡日期'] + time_columns)
+        conn.execute(f"CREATE TABLE integrated_punch ({columns})")
+        conn.executemany(f"INSERT INTO integrated_punch VALUES ({', '.join('?' * (5 + len(time_columns)))})", rows)
+        conn.commit()
+        conn.close()
+
+    def night_meal_data(self, class_name):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            rules = night_meal.create_rules_dict(conn)
+            time_columns = night_meal.get_time_columns(conn.cursor())
+        finally:
+            conn.close()
+        return night_meal.process_night_meal_data(self.db_path, class_name, rules[class_name], time_columns, frozenset())
+
+    def test_multi_year_same_day_counts_each_date(self):
+        """同一月份中不同年份的同一天各算一天，日期格子只標記實際出現的日期"""
+        self.build_db(['刷卡時間1', '刷卡時間2'], [
+            ('A001', '1', '王小明', '夜班', '2024-02-10', '08:00:00', '22:30:00'),
+            ('A001', '1', '王小明', '夜班', '2025-02-10', '08:00:00', '23:00:00'),
+            ('A001', '1', '王小明', '夜班', '2025-02-11', '08:00:00', '22:10:00'),
+            ('A001', '1', '王小明', '夜班', '2025-02-12', '08:00:00', '21:00:00'),  # 未超過門檻
+        ])
+
+        night_meal.output_night_meal_results(str(self.tmp_path), self.night_meal_data('夜班'), date(2025, 1, 1))
+
+        page = (self.tmp_path / 'night_meal_records.html').read_text(encoding='utf-8')
+        self.assertEqual(re.findall(r"<td class='total-days'>(\d+)</td>", page), ['3'])
+        self.assertEqual(re.findall(r'date-box filled">(\d+)<', page), ['10', '11'])
+
+    def test_single_time_column(self):
+        """只有一個刷卡時間欄位時仍能判斷夜點"""
+        self.build_db(['刷卡時間1'], [
+            ('A001', '1', '王小明', '夜班', '2025-02-10', '23:00:00'),
+        ])
+
+        self.assertEqual([row[3:5] for row in self.night_meal_data('夜班')], [['02', '10']])
+
+    def test_invalid_dates_are_skipped(self):
+        """非 YYYY-MM-DD 的刷卡日期記錄錯誤後略過，不影響其他資料"""
+        self.build_db(['刷卡時間1'], [
+            ('A001', '1', '王小明', '夜班', '1140210.0', '23:00:00'),
+            ('A001', '1', '王小明', '夜班', '2025-02-30', '23:00:00'),
+            ('A001', '1', '王小明', '夜班', '2025-02-11', '23:00:00'),
+        ])
+
+        with self.assertLogs(level='ERROR'):
+            data = self.night_meal_data('夜班')
+        self.assertEqual([row[3:5] for row in data], [['02', '11']])
+
+
+if __name__ == '__main__':
+    unittest.main()